@@ -0,0 +1,42 @@
+import threading
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Iterator, Optional
+from django.conf import settings
+from django.db import transaction
+
+# SQLite allows one writer at a time. Sync transactions in this process queue on this
+# lock rather than contending for the database lock and spinning on busy_timeout.
+_write_lane = threading.RLock()
+
+
+def write_lane() -> AbstractContextManager:
+    return _write_lane if settings.SYNC_WRITE_LANE else nullcontext()
+
+
+@contextmanager
+def immediate_atomic(using: Optional[str] = None) -> Iterator[None]:
+    # BEGIN IMMEDIATE takes the write lock up front, so a transaction that reads before it
+    # writes waits on busy_timeout instead of failing with "database is locked" when it
+    # upgrades. Read-only transactions keep the deferred default and never take the lock.
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block:
+        # Nested blocks are savepoints of a transaction that has already begun
+        with transaction.atomic(using=using):
+            yield
+        return
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
+
+
+@contextmanager
+def write_transaction() -> Iterator[None]:
+    # A data write: queued on the write lane, then begun IMMEDIATE
+    with write_lane(), immediate_atomic():
+        yield
@@ -19,17 +19,32 @@ def _unique_constraint_message(message: str) -> str:
     return 'Data constraint violation'
 
 
+def flatten_errors(detail: Any) -> dict[str, Any]:
+    errors: dict[str, Any] = {}
+    if isinstance(detail, dict):
+        for key, value in detail.items():
+            errors[key] = value[0] if isinstance(value, list) else value
+    return errors
+
+
+def item_errors(exc: Exception) -> dict[str, Any]:
+    # Per-item errors use the same flattened shape as a rejected request
+    if isinstance(exc, IntegrityError):
+        return {'non_field_errors': _unique_constraint_message(str(exc))}
+    if isinstance(exc, ValidationError) and isinstance(exc.detail, dict):
+        return flatten_errors(exc.detail)
+    if isinstance(exc, ValidationError) and isinstance(exc.detail, list) and exc.detail:
+        return {'non_field_errors': exc.detail[0]}
+    return {'non_field_errors': str(exc)}
+
+
 def api_exception_handler(exc: Exception, context: dict) -> Response:
     if isinstance(exc, IntegrityError):
         payload = response_with_status(drf_status.HTTP_409_CONFLICT, _unique_constraint_message(str(exc)))
         return Response(payload, status=drf_status.HTTP_409_CONFLICT)
 
     if isinstance(exc, ValidationError):
-        detail = exc.detail
-        errors: dict[str, Any] = {}
-        if isinstance(detail, dict):
-            for key, value in detail.items():
-                errors[key] = value[0] if isinstance(value, list) else value
+        errors = flatten_errors(exc.detail)
         payload = response_with_status(
             drf_status.HTTP_400_BAD_REQUEST,
             'Validation failed for one of the items in the data array.',
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class GraphqlApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'graphql_api'
+
+    def ready(self):
+        from sync.changes import changes_committed
+        from .pubsub import publish_changes
+
+        changes_committed.connect(publish_changes, dispatch_uid='graphql_api.publish_changes')
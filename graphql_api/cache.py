@@ -0,0 +1,82 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from django.conf import settings
+from graphql import GraphQLError, OperationDefinitionNode, OperationType, parse, print_ast
+from sync.models import Employee
+from sync.versions import model_versions
+
+# Models the schema reads; a write to any of them bumps its version and retires every
+# cached result computed before the write
+CACHED_MODELS = (Employee,)
+
+
+class QueryResultCache:
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, body = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+query_cache = QueryResultCache(settings.GRAPHQL_CACHE_SIZE, settings.GRAPHQL_CACHE_TTL)
+
+
+def normalized_query(params: dict) -> Optional[str]:
+    # Returns the reprinted document when the selected operation is a query, so whitespace,
+    # comments and formatting do not split the cache; None means "do not cache"
+    query = params.get('query')
+    if not isinstance(query, str):
+        return None
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return None
+    operations = [node for node in document.definitions if isinstance(node, OperationDefinitionNode)]
+    name = params.get('operationName')
+    if name:
+        operations = [node for node in operations if node.name and node.name.value == name]
+    if len(operations) != 1 or operations[0].operation != OperationType.QUERY:
+        return None
+    return print_ast(document)
+
+
+def cache_key(document: str, params: dict, versions: tuple[int, ...]) -> str:
+    # Versions are part of the key: after a write, older entries are never looked up again
+    # and age out through the LRU and TTL
+    raw = json.dumps(
+        [document, params.get('operationName'), params.get('variables') or {}, versions],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def current_versions() -> tuple[int, ...]:
+    return model_versions(*CACHED_MODELS)
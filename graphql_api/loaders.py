@@ -0,0 +1,62 @@
+from typing import Iterable, Optional
+from asgiref.sync import sync_to_async
+from strawberry.dataloader import DataLoader
+from strawberry.types import Info
+from strawberry.types.nodes import FragmentSpread, InlineFragment, SelectedField
+from strawberry.utils.str_converters import to_camel_case
+from sync.models import Employee
+
+# GraphQL field name -> Employee columns it reads; computed fields list their inputs
+EMPLOYEE_FIELD_COLUMNS: dict[str, tuple[str, ...]] = {
+    to_camel_case(field.name): (field.attname,) for field in Employee._meta.concrete_fields
+}
+EMPLOYEE_FIELD_COLUMNS['fullName'] = ('first_name', 'middle_name', 'last_name')
+
+
+def _selected_names(selections: Iterable) -> Iterable[str]:
+    for selection in selections:
+        if isinstance(selection, (FragmentSpread, InlineFragment)):
+            yield from _selected_names(selection.selections)
+        elif isinstance(selection, SelectedField):
+            yield selection.name
+
+
+def selected_columns(selections: Iterable, field_columns: dict[str, tuple[str, ...]]) -> tuple[str, ...]:
+    columns = {column for name in _selected_names(selections) for column in field_columns.get(name, ())}
+    return tuple(sorted(columns))
+
+
+def _children(selections: Iterable, name: str) -> list:
+    children = []
+    for selection in selections:
+        if isinstance(selection, (FragmentSpread, InlineFragment)):
+            children.extend(_children(selection.selections, name))
+        elif isinstance(selection, SelectedField) and selection.name == name:
+            children.extend(selection.selections)
+    return children
+
+
+def employee_columns(info: Info, path: Iterable[str] = ()) -> tuple[str, ...]:
+    # `path` leads from the current field to the employee objects, e.g. edges.node
+    selections = info.selected_fields[0].selections
+    for name in path:
+        selections = _children(selections, name)
+    return selected_columns(selections, EMPLOYEE_FIELD_COLUMNS)
+
+
+async def _load_employees(keys: list[tuple[int, tuple[str, ...]]]) -> list[Optional[Employee]]:
+    # Keys carry each field's projection; the batch loads the union of them in one IN query
+    columns = sorted({column for _, key_columns in keys for column in key_columns})
+    ids = list({pk for pk, _ in keys})
+    employees = await sync_to_async(Employee.objects.only(*columns).in_bulk)(ids)
+    return [employees.get(pk) for pk, _ in keys]
+
+
+def employee_loader(info: Info) -> DataLoader:
+    # One loader per request, kept on the context so every field in the document shares it
+    context = info.context
+    if isinstance(context, dict):
+        return context.setdefault('employee_loader', DataLoader(load_fn=_load_employees))
+    if not hasattr(context, 'employee_loader'):
+        context.employee_loader = DataLoader(load_fn=_load_employees)
+    return context.employee_loader
@@ -0,0 +1,12 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class PubSubEvent(models.Model):
+    # Outbox read by every worker process when GRAPHQL_PUBSUB_BACKEND is SQLitePubSub
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.topic}#{self.pk}"
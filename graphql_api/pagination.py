@@ -0,0 +1,47 @@
+import base64
+import json
+from typing import Any, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Model, Q, QuerySet
+from graphql import GraphQLError
+
+
+def encode_cursor(sort: str, value: Any, pk: int) -> str:
+    raw = json.dumps([sort, value, pk], default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple[Any, int]:
+    try:
+        cursor_sort, value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise GraphQLError('Invalid cursor')
+    if cursor_sort != sort:
+        raise GraphQLError('Cursor was issued for a different ordering')
+    return value, int(pk)
+
+
+def page_size(first: Optional[int]) -> int:
+    if first is None:
+        return settings.GRAPHQL_DEFAULT_PAGE_SIZE
+    if first < 0 or first > settings.GRAPHQL_MAX_PAGE_SIZE:
+        raise GraphQLError(f"first must be between 0 and {settings.GRAPHQL_MAX_PAGE_SIZE}")
+    return first
+
+
+async def keyset_page(
+    queryset: QuerySet, sort: str, first: Optional[int], after: Optional[str]
+) -> tuple[list[Model], bool]:
+    # Pages continue strictly after (sort value, id) of the last row seen, so the database
+    # seeks with the index instead of skipping an offset, and inserted rows do not shift pages.
+    size = page_size(first)
+    queryset = queryset.order_by(sort, 'pk') if sort != 'pk' else queryset.order_by('pk')
+    if after:
+        value, pk = decode_cursor(after, sort)
+        if sort == 'pk':
+            queryset = queryset.filter(pk__gt=pk)
+        else:
+            queryset = queryset.filter(Q(**{f'{sort}__gt': value}) | Q(**{sort: value, 'pk__gt': pk}))
+    rows = await sync_to_async(list)(queryset[:size + 1])
+    return rows[:size], len(rows) > size
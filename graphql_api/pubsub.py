@@ -1,25 +1,215 @@
 import asyncio
-from collections import defaultdict
-from typing import Any, AsyncGenerator
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import Any, AsyncGenerator, Callable, Optional
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import PubSubEvent
+
+logger = logging.getLogger('sync_bridge.pubsub')
+
+CHANGES_TOPIC = 'changes'
+
+DROP_OLDEST = 'drop_oldest'
+COALESCE = 'coalesce'
+DISCONNECT = 'disconnect'
+OVERFLOW_POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+
+class SubscriberOverflow(Exception):
+    pass
+
+
+class Subscriber:
+    def __init__(self, max_size: int, overflow: str, merge: Optional[Callable[[Any, Any], Any]] = None) -> None:
+        self.max_size = max_size
+        self.overflow = overflow
+        # Folds a newer event into the newest queued one when coalescing
+        self.merge = merge
+        self.pending: deque[Any] = deque()
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def offer(self, payload: Any) -> int:
+        # Never blocks; returns how many events were dropped to make room
+        if self.overflowed:
+            return 0
+        dropped = 0
+        if len(self.pending) >= self.max_size:
+            if self.overflow == DISCONNECT:
+                self.overflowed = True
+                self.pending.clear()
+                self.ready.set()
+                return 0
+            if self.overflow == COALESCE and self.merge is not None:
+                self.pending[-1] = self.merge(self.pending[-1], payload)
+                return 0
+            self.pending.popleft()
+            dropped = 1
+        self.pending.append(payload)
+        self.ready.set()
+        return dropped
+
+    async def get(self) -> Any:
+        while not self.pending:
+            if self.overflowed:
+                raise SubscriberOverflow('Subscriber fell too far behind and was disconnected')
+            self.ready.clear()
+            await self.ready.wait()
+        return self.pending.popleft()
 
 
 class InMemoryPubSub:
-    def __init__(self) -> None:
-        self._queues: dict[str, list[asyncio.Queue]] = defaultdict(list)
+    # Delivers to subscribers in this process only. Cross-process backends subclass it,
+    # override publish to hand events to their broker and call deliver() for each event
+    # the broker returns, so every backend shares the bounded per-subscriber queues.
+    def __init__(self, max_size: int = 100, overflow: str = DROP_OLDEST) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.max_size = max_size
+        self.overflow = overflow
+        self._subscribers: dict[str, list[Subscriber]] = defaultdict(list)
+        self._dropped: dict[str, int] = defaultdict(int)
+        self._disconnected: dict[str, int] = defaultdict(int)
 
     async def publish(self, topic: str, payload: Any) -> None:
-        for queue in list(self._queues.get(topic, [])):
-            await queue.put(payload)
+        self.deliver(topic, payload)
 
-    async def subscribe(self, topic: str) -> AsyncGenerator[Any, None]:
-        queue: asyncio.Queue = asyncio.Queue()
-        self._queues[topic].append(queue)
+    def deliver(self, topic: str, payload: Any) -> None:
+        # Fan-out only appends to each subscriber's bounded queue, so a slow client never
+        # holds up the publisher or the other subscribers
+        for subscriber in list(self._subscribers.get(topic, [])):
+            was_overflowed = subscriber.overflowed
+            self._dropped[topic] += subscriber.offer(payload)
+            if subscriber.overflowed and not was_overflowed:
+                self._disconnected[topic] += 1
+
+    async def subscribe(self, topic: str, overflow: Optional[str] = None) -> AsyncGenerator[Any, None]:
+        subscriber = Subscriber(self.max_size, overflow or self.overflow, MERGERS.get(topic))
+        self._subscribers[topic].append(subscriber)
         try:
             while True:
-                item = await queue.get()
-                yield item
+                yield await subscriber.get()
         finally:
-            self._queues[topic].remove(queue)
+            self._subscribers[topic].remove(subscriber)
+
+    def stats(self) -> dict[str, dict]:
+        topics = set(self._subscribers) | set(self._dropped) | set(self._disconnected)
+        stats = {}
+        for topic in sorted(topics):
+            depths = [len(subscriber.pending) for subscriber in self._subscribers.get(topic, [])]
+            stats[topic] = {
+                'subscribers': len(depths),
+                'queued': sum(depths),
+                'max_depth': max(depths, default=0),
+                'dropped': self._dropped.get(topic, 0),
+                'disconnected': self._disconnected.get(topic, 0),
+            }
+        return stats
+
+
+class SQLitePubSub(InMemoryPubSub):
+    # Broadcasts across the worker processes sharing the database. publish appends to the
+    # PubSubEvent table; while a process has subscribers, one task per process reads new
+    # rows in batches of GRAPHQL_PUBSUB_BATCH_SIZE and fans them out locally. Payloads
+    # must be JSON serializable.
+    def __init__(self, max_size: int = 100, overflow: str = DROP_OLDEST) -> None:
+        super().__init__(max_size, overflow)
+        self.poll_interval = settings.GRAPHQL_PUBSUB_POLL_INTERVAL
+        self.batch_size = settings.GRAPHQL_PUBSUB_BATCH_SIZE
+        self.retention = timedelta(seconds=settings.GRAPHQL_PUBSUB_RETENTION)
+        self._poller: Optional[asyncio.Task] = None
+        self._next_prune = 0.0
+
+    async def publish(self, topic: str, payload: Any) -> None:
+        await sync_to_async(self._append)(topic, payload)
+
+    async def subscribe(self, topic: str, overflow: Optional[str] = None) -> AsyncGenerator[Any, None]:
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        async for payload in super().subscribe(topic, overflow):
+            yield payload
+
+    def _append(self, topic: str, payload: Any) -> None:
+        PubSubEvent.objects.create(topic=topic, payload=payload)
+        self._prune()
+
+    def _prune(self) -> None:
+        # Every process reads new rows within a poll interval, so old ones are only kept for
+        # late readers. Publishers and pollers both prune, at most twice per retention period,
+        # so the table stays bounded however little a process publishes.
+        if time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + self.retention.total_seconds() / 2
+        PubSubEvent.objects.filter(created_at__lt=timezone.now() - self.retention).delete()
+
+    def _latest_id(self) -> int:
+        latest = PubSubEvent.objects.order_by('-pk').values_list('pk', flat=True).first()
+        return latest or 0
+
+    def _fetch(self, after_id: int) -> list[tuple[int, str, Any]]:
+        events = PubSubEvent.objects.filter(pk__gt=after_id).order_by('pk')
+        return list(events.values_list('pk', 'topic', 'payload')[:self.batch_size])
+
+    async def _poll(self) -> None:
+        # Starts at the current end of the table: subscribers only see events published
+        # after they subscribed
+        last_id = await sync_to_async(self._latest_id)()
+        while any(self._subscribers.values()):
+            try:
+                events = await sync_to_async(self._fetch)(last_id)
+            except Exception as exc:
+                logger.warning(json.dumps({'event': 'pubsub.poll_failed', 'error': str(exc)}))
+                events = []
+            for event_id, topic, payload in events:
+                self.deliver(topic, payload)
+                last_id = event_id
+            if len(events) < self.batch_size:
+                try:
+                    await sync_to_async(self._prune)()
+                except Exception as exc:
+                    logger.warning(json.dumps({'event': 'pubsub.prune_failed', 'error': str(exc)}))
+                await asyncio.sleep(self.poll_interval)
+
+
+def merge_changes(queued: dict, event: dict) -> dict:
+    # One batch covering both: ids and fields are unioned per model. The source and
+    # history id are only kept when both batches share them. Returns a new dict, since
+    # the queued event may be the same object other subscribers hold.
+    merged = {
+        entry['model']: {**entry, 'created': list(entry['created']), 'updated': list(entry['updated']),
+                         'deleted': list(entry['deleted'])}
+        for entry in queued['changes']
+    }
+    for entry in event['changes']:
+        target = merged.setdefault(
+            entry['model'], {'model': entry['model'], 'created': [], 'updated': [], 'deleted': [], 'fields': []}
+        )
+        for action in ('created', 'updated', 'deleted'):
+            seen = set(target[action])
+            target[action].extend(pk for pk in entry[action] if pk not in seen)
+        target['fields'] = sorted(set(target['fields']) | set(entry['fields']))
+    return {
+        'source': queued['source'] if queued['source'] == event['source'] else 'coalesced',
+        'history_id': queued['history_id'] if queued['history_id'] == event['history_id'] else None,
+        'changes': list(merged.values()),
+    }
+
+
+# Topics whose events can be folded together under the coalesce overflow policy
+MERGERS: dict[str, Callable[[Any, Any], Any]] = {CHANGES_TOPIC: merge_changes}
+
+
+def publish_changes(sender, event: dict, **kwargs) -> None:
+    # changes_committed receiver; runs in the thread that committed the write
+    async_to_sync(pubsub.publish)(CHANGES_TOPIC, event)
 
 
-pubsub = InMemoryPubSub()
+pubsub: InMemoryPubSub = import_string(settings.GRAPHQL_PUBSUB_BACKEND)(
+    settings.GRAPHQL_SUBSCRIPTION_QUEUE_SIZE, settings.GRAPHQL_SUBSCRIPTION_OVERFLOW
+)
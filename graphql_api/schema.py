@@ -1,11 +1,22 @@
 from dataclasses import asdict
-from typing import AsyncGenerator
+from enum import Enum
+from typing import AsyncGenerator, Optional
 import strawberry
 from asgiref.sync import sync_to_async
-from django.db.models import Q
+from django.db.models import QuerySet
 import strawberry_django
 from sync.models import Employee
-from .pubsub import pubsub
+from common.db import write_transaction
+from sync.search import search_employees
+from sync.change_detection import changed_fields
+from sync.changes import ChangeBatch
+from sync.versions import bump_version
+from .loaders import employee_columns, employee_loader
+from .pagination import encode_cursor, keyset_page
+from .pubsub import CHANGES_TOPIC, pubsub
+
+# Model name used by /api/v1/sync and in change events
+EMPLOYEES = 'employees'
 
 
 @strawberry_django.type(Employee, name="EmployeeType")
@@ -36,6 +47,82 @@ class EmployeeType:
     full_name: str = strawberry.field(resolver=lambda root: root.full_name)
 
 
+@strawberry.enum
+class EmployeeOrder(Enum):
+    # Only indexed columns, so every page is an index seek
+    ID = 'pk'
+    EMAIL = 'email'
+
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: Optional[str]
+
+
+@strawberry.type
+class EmployeeEdge:
+    cursor: str
+    node: EmployeeType
+
+
+@strawberry.type
+class EmployeeConnection:
+    edges: list[EmployeeEdge]
+    page_info: PageInfo
+    queryset: strawberry.Private[QuerySet]
+
+    @strawberry.field
+    async def total_count(self) -> int:
+        # Counted only when the client selects it
+        return await self.queryset.acount()
+
+
+async def employee_connection(
+    info: strawberry.Info, queryset: QuerySet, first: Optional[int], after: Optional[str], order_by: EmployeeOrder
+) -> EmployeeConnection:
+    sort = order_by.value
+    columns = set(employee_columns(info, ('edges', 'node')))
+    if sort != 'pk':
+        columns.add(sort)
+    rows, has_next = await keyset_page(queryset.only(*columns), sort, first, after)
+    edges = [EmployeeEdge(cursor=encode_cursor(sort, getattr(row, sort), row.pk), node=row) for row in rows]
+    return EmployeeConnection(
+        edges=edges,
+        page_info=PageInfo(has_next_page=has_next, end_cursor=edges[-1].cursor if edges else None),
+        queryset=queryset,
+    )
+
+
+@strawberry.type
+class ModelChanges:
+    model: str
+    created: list[int]
+    updated: list[int]
+    deleted: list[int]
+    fields: list[str]
+
+
+@strawberry.type
+class ChangeBatchType:
+    source: str
+    history_id: Optional[int]
+    changes: list[ModelChanges]
+
+
+def _filter_changes(event: dict, models: Optional[list[str]], fields: Optional[list[str]]) -> Optional[ChangeBatchType]:
+    # A deletion matches any field filter; updates and creations must touch a requested field
+    changes = [
+        ModelChanges(**entry)
+        for entry in event['changes']
+        if (models is None or entry['model'] in models)
+        and (fields is None or entry['deleted'] or set(fields) & set(entry['fields']))
+    ]
+    if not changes:
+        return None
+    return ChangeBatchType(source=event['source'], history_id=event['history_id'], changes=changes)
+
+
 @strawberry_django.input(Employee, exclude=['id'])
 class CreateEmployeeInput:
     pass
@@ -49,59 +136,129 @@ class UpdateEmployeeInput:
 @strawberry.type
 class Query:
     @strawberry.field
-    async def employees(self, offset: int = 0, limit: int = 10) -> list[EmployeeType]:
-        qs = Employee.objects.all()[offset:offset + limit]
+    async def employees(self, info: strawberry.Info, offset: int = 0, limit: int = 10) -> list[EmployeeType]:
+        qs = Employee.objects.only(*employee_columns(info))[offset:offset + limit]
         return await sync_to_async(list)(qs)
 
     @strawberry.field
-    async def employee(self, id: int) -> EmployeeType | None:
-        return await Employee.objects.filter(pk=id).afirst()
+    async def employee(self, info: strawberry.Info, id: int) -> EmployeeType | None:
+        return await employee_loader(info).load((id, employee_columns(info)))
 
     @strawberry.field
-    async def searchEmployees(self, search: str, offset: int = 0, limit: int = 10) -> list[EmployeeType]:
-        query = (
-            Q(first_name__icontains=search)
-            | Q(last_name__icontains=search)
-            | Q(email__icontains=search)
-        )
-        qs = Employee.objects.filter(query)[offset:offset + limit]
-        return await sync_to_async(list)(qs)
+    async def searchEmployees(
+        self, info: strawberry.Info, search: str, offset: int = 0, limit: int = 10
+    ) -> list[EmployeeType]:
+        # search_employees checks for the FTS table, which touches the database
+        qs = await sync_to_async(search_employees)(search)
+        return await sync_to_async(list)(qs.only(*employee_columns(info))[offset:offset + limit])
+
+    @strawberry.field
+    async def employeesConnection(
+        self,
+        info: strawberry.Info,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: EmployeeOrder = EmployeeOrder.ID,
+    ) -> EmployeeConnection:
+        return await employee_connection(info, Employee.objects.all(), first, after, order_by)
+
+    @strawberry.field
+    async def searchEmployeesConnection(
+        self,
+        info: strawberry.Info,
+        search: str,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: EmployeeOrder = EmployeeOrder.ID,
+    ) -> EmployeeConnection:
+        qs = await sync_to_async(search_employees)(search)
+        return await employee_connection(info, qs, first, after, order_by)
+
+
+def _employee_event(employee: Employee) -> dict:
+    # Events may cross processes, so they carry plain field values rather than the instance
+    return {field.attname: field.value_from_object(employee) for field in Employee._meta.concrete_fields}
+
+
+def _employee_from_event(payload: dict) -> Employee:
+    return Employee(**{
+        field.attname: field.to_python(payload.get(field.attname)) for field in Employee._meta.concrete_fields
+    })
+
+
+def _create_employee(employee_data: dict) -> Employee:
+    changes = ChangeBatch('graphql')
+    with write_transaction():
+        employee = Employee.objects.create(**employee_data)
+        bump_version(Employee)
+        changes.record(EMPLOYEES, created=[employee.pk], fields=list(employee_data))
+        changes.finish()
+    return employee
+
+
+def _update_employee(id: int, employee_data: dict) -> Optional[Employee]:
+    changes = ChangeBatch('graphql')
+    with write_transaction():
+        employee = Employee.objects.filter(pk=id).first()
+        if not employee:
+            return None
+        fields = changed_fields(employee, employee_data)
+        for key, value in employee_data.items():
+            setattr(employee, key, value)
+        employee.save()
+        bump_version(Employee)
+        changes.record(EMPLOYEES, updated=[employee.pk], fields=fields)
+        changes.finish()
+    return employee
+
+
+def _delete_employee(id: int) -> bool:
+    changes = ChangeBatch('graphql')
+    with write_transaction():
+        count, _ = Employee.objects.filter(pk=id).delete()
+        if count:
+            bump_version(Employee)
+            changes.record(EMPLOYEES, deleted=[id])
+            changes.finish()
+    return count > 0
 
 
 @strawberry.type
 class Mutation:
+    # Writes bump the Employee version in the same transaction, which invalidates cached reads
     @strawberry.mutation
     async def createEmployee(self, data: CreateEmployeeInput) -> EmployeeType:
         employee_data = {k: v for k, v in asdict(data).items() if v is not strawberry.UNSET}
-        employee = await Employee.objects.acreate(**employee_data)
-        await pubsub.publish('employee_created', employee)
+        employee = await sync_to_async(_create_employee)(employee_data)
+        await pubsub.publish('employee_created', _employee_event(employee))
         return employee
 
     @strawberry.mutation
     async def updateEmployee(self, id: int, data: UpdateEmployeeInput) -> EmployeeType | None:
-        employee = await Employee.objects.filter(pk=id).afirst()
-        if not employee:
-            return None
         employee_data = {k: v for k, v in asdict(data).items() if v is not strawberry.UNSET}
-        for key, value in employee_data.items():
-            setattr(employee, key, value)
-        await employee.asave()
-        return employee
+        return await sync_to_async(_update_employee)(id, employee_data)
 
     @strawberry.mutation
     async def deleteEmployee(self, id: int) -> bool:
-        # filter(...).adelete() is available in newer Django versions
-        # or we can fetch and delete
-        count, _ = await Employee.objects.filter(pk=id).adelete()
-        return count > 0
+        return await sync_to_async(_delete_employee)(id)
 
 
 @strawberry.type
 class Subscription:
     @strawberry.subscription
     async def employeeCreated(self) -> AsyncGenerator[EmployeeType, None]:
-        async for employee in pubsub.subscribe('employee_created'):
-            yield employee
+        async for payload in pubsub.subscribe('employee_created'):
+            yield _employee_from_event(payload)
+
+    @strawberry.subscription
+    async def changes(
+        self, models: Optional[list[str]] = None, fields: Optional[list[str]] = None
+    ) -> AsyncGenerator[ChangeBatchType, None]:
+        # One event per committed sync transaction or mutation, filtered before it is sent
+        async for event in pubsub.subscribe(CHANGES_TOPIC):
+            batch = _filter_changes(event, models, fields)
+            if batch is not None:
+                yield batch
 
 
 schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription)
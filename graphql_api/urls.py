@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import SubscriptionStatsView
+
+urlpatterns = [
+    path('graphql/subscriptions/stats', SubscriptionStatsView.as_view(), name='graphql-subscription-stats'),
+]
@@ -1,8 +1,16 @@
+import json
+from typing import Optional
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from strawberry.django.views import AsyncGraphQLView
-from common.responses import response_with_status
+from common.monitoring import monitored
+from common.responses import ok, response_with_status
+from .cache import cache_key, current_versions, normalized_query, query_cache
+from .pubsub import pubsub
 from .schema import schema
 
 
@@ -14,5 +22,54 @@ async def graphql_view(request, *args, **kwargs):
         payload = response_with_status(401, 'Access Denied')
         return JsonResponse(payload, status=401)
 
-    view = AsyncGraphQLView.as_view(schema=schema, graphiql=True)
-    return await view(request, *args, **kwargs)
+    view = AsyncGraphQLView.as_view(schema=schema, graphql_ide='graphiql')
+    key = await _cache_key(request)
+    if key is None:
+        return await view(request, *args, **kwargs)
+
+    body = query_cache.get(key)
+    if body is not None:
+        response = HttpResponse(body, content_type='application/json')
+        response['X-GraphQL-Cache'] = 'hit'
+        return response
+
+    response = await view(request, *args, **kwargs)
+    if response.status_code == 200 and 'errors' not in json.loads(response.content):
+        query_cache.set(key, response.content)
+    response['X-GraphQL-Cache'] = 'miss'
+    return response
+
+
+async def _cache_key(request) -> Optional[str]:
+    if query_cache.max_entries <= 0:
+        return None
+    params = _request_params(request)
+    document = normalized_query(params) if params else None
+    if document is None:
+        return None
+    # Read before executing: a write committing meanwhile bumps past this version, so the
+    # entry stored under it can only be newer than what the key promises
+    versions = await sync_to_async(current_versions)()
+    return cache_key(document, params, versions)
+
+
+def _request_params(request) -> Optional[dict]:
+    try:
+        if request.method == 'GET':
+            params = request.GET.dict()
+            if 'variables' in params:
+                params['variables'] = json.loads(params['variables'])
+            return params
+        if request.method == 'POST' and request.content_type == 'application/json':
+            params = json.loads(request.body)
+            return params if isinstance(params, dict) else None
+    except ValueError:
+        return None
+    return None
+
+
+class SubscriptionStatsView(APIView):
+    # Per-topic queue depth and drops for this process's subscribers
+    @monitored('graphql.subscription_stats')
+    def get(self, request):
+        return Response(ok('Subscription stats retrieved successfully', pubsub.stats()))
@@ -0,0 +1,289 @@
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.validators import UniqueValidator
+import rest_framework.serializers as serializers
+
+from .change_detection import changed_fields, is_unchanged
+from .fast_validation import compiled_validator, pop_unique_validators
+from .models import Order
+from .order_items import reconcile_order_items
+from .serializers import PrefetchedPrimaryKeyRelatedField
+
+
+def _coerce_pk(value: Any) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        # Let the serializer's validation report the invalid ID format
+        return None
+
+
+def _auto_now_fields(ModelClass: type[models.Model]) -> list[str]:
+    return [field.name for field in ModelClass._meta.concrete_fields if getattr(field, 'auto_now', False)]
+
+
+def _chunks(values: list, size: int):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _validate_with_serializer(
+    SerializerClass: type[serializers.ModelSerializer],
+    item_data: dict,
+    context: dict,
+    instance: Optional[models.Model] = None,
+) -> dict:
+    # Rows the compiled validator does not accept go through DRF, which raises the usual errors
+    serializer = SerializerClass(instance=instance, data=item_data, context=context)
+    pop_unique_validators(serializer)
+    serializer.is_valid(raise_exception=True)
+    return dict(serializer.validated_data)
+
+
+def _check_unique(
+    rows: list[tuple[Optional[models.Model], dict]],
+    unique_validators: dict[str, UniqueValidator],
+    ModelClass: type[models.Model],
+    batch_size: int,
+) -> None:
+    for name, validator in unique_validators.items():
+        values = list({data[name] for _, data in rows if data.get(name) is not None})
+        owners: dict[Any, Any] = {}
+        for chunk in _chunks(values, batch_size):
+            owners.update(ModelClass.objects.filter(**{f'{name}__in': chunk}).values_list(name, 'pk'))
+
+        claimed: dict[Any, Any] = {}
+        for instance, data in rows:
+            value = data.get(name)
+            if value is None:
+                continue
+            target = instance.pk if instance is not None else data.get('id')
+            owner = owners.get(value)
+            if owner is not None and owner != target:
+                raise ValidationError({name: [validator.message]}, code='unique')
+            if value in claimed and (target is None or claimed[value] != target):
+                raise ValidationError({name: [validator.message]}, code='unique')
+            claimed[value] = target
+
+
+def _collect_references(
+    fields: dict[str, serializers.Field], rows: list[dict], wanted: dict[type[models.Model], set[int]]
+) -> None:
+    for name, field in fields.items():
+        if isinstance(field, PrefetchedPrimaryKeyRelatedField):
+            ids = wanted[field.get_queryset().model]
+            ids.update(pk for pk in (_coerce_pk(row.get(name)) for row in rows) if pk is not None)
+        elif isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.Serializer):
+            children = [
+                child
+                for row in rows if isinstance(row.get(name), list)
+                for child in row[name] if isinstance(child, dict)
+            ]
+            _collect_references(field.child.fields, children, wanted)
+
+
+def prefetch_references(
+    data: list[dict], SerializerClass: type[serializers.ModelSerializer]
+) -> dict[type[models.Model], dict[int, models.Model]]:
+    # Every referenced id in the batch, nested items included, is checked with one IN query
+    # per related model; the serializers then validate against these in-memory maps.
+    wanted: dict[type[models.Model], set[int]] = defaultdict(set)
+    _collect_references(SerializerClass().fields, data, wanted)
+    return {
+        RelatedModel: RelatedModel.objects.only('pk').in_bulk(ids) if ids else {}
+        for RelatedModel, ids in wanted.items()
+    }
+
+
+def bulk_upsert(
+    data: list[dict], ModelClass: type[models.Model], SerializerClass: type[serializers.ModelSerializer]
+) -> list[dict[str, Any]]:
+    # One in_bulk lookup for every id in the batch, then chunked bulk writes.
+    batch_size = settings.SYNC_BATCH_SIZE
+    pks = {pk for pk in (_coerce_pk(item.get('id')) for item in data) if pk is not None}
+    existing: dict[int, models.Model] = ModelClass.objects.in_bulk(pks) if pks else {}
+
+    context = {'prefetched': prefetch_references(data, SerializerClass)}
+    compiled = compiled_validator(SerializerClass)
+    fast_validate = compiled.bind(context)
+
+    rows: list[tuple[Optional[models.Model], dict]] = []
+    unique_validators: dict[str, UniqueValidator] = dict(compiled.unique_validators)
+    for item_data in data:
+        pk = _coerce_pk(item_data.get('id'))
+        instance = existing.get(pk) if pk is not None else None
+
+        validated_data = fast_validate(item_data)
+        if validated_data is None:
+            validated_data = _validate_with_serializer(SerializerClass, item_data, context, instance)
+        rows.append((instance, validated_data))
+
+    _check_unique(rows, unique_validators, ModelClass, batch_size)
+
+    to_create: list[models.Model] = []
+    to_update: dict[int, models.Model] = {}
+    update_fields: set[str] = set()
+    nested_items: list[tuple[models.Model, Optional[list[dict]]]] = []
+    entries: list[tuple[models.Model, str, list[str]]] = []
+    staged: dict[int, models.Model] = {}
+
+    for instance, validated_data in rows:
+        items_data = validated_data.pop('items', None)
+        if instance is None and validated_data.get('id') is not None:
+            # A later item in the same batch may reference a row created earlier in it
+            instance = staged.get(validated_data['id'])
+
+        if instance is None:
+            instance = ModelClass(**validated_data)
+            to_create.append(instance)
+            if instance.pk is not None:
+                staged[instance.pk] = instance
+            status = 'created'
+            fields = [name for name in validated_data if name != 'id']
+        elif not instance._state.adding and is_unchanged(instance, validated_data):
+            # Identical or older rows are reported without a write
+            status = 'unchanged'
+            fields = []
+        else:
+            fields = changed_fields(instance, validated_data)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            if not instance._state.adding:
+                to_update[id(instance)] = instance
+                update_fields.update(validated_data)
+            status = 'updated'
+
+        nested_items.append((instance, items_data))
+        entries.append((instance, status, fields))
+
+    if to_create:
+        ModelClass.objects.bulk_create(to_create, batch_size=batch_size)
+
+    update_fields.discard(ModelClass._meta.pk.name)
+    if to_update and update_fields:
+        # bulk_update bypasses save(), so auto_now columns must be stamped here
+        now = timezone.now()
+        auto_now = _auto_now_fields(ModelClass)
+        for instance in to_update.values():
+            for name in auto_now:
+                setattr(instance, name, now)
+        ModelClass.objects.bulk_update(
+            list(to_update.values()), sorted(update_fields | set(auto_now)), batch_size=batch_size
+        )
+
+    item_counts = _reconcile_nested_items(ModelClass, nested_items)
+    return [_result(instance, status, item_counts, fields) for instance, status, fields in entries]
+
+
+def bulk_upsert_on_conflict(
+    data: list[dict],
+    ModelClass: type[models.Model],
+    SerializerClass: type[serializers.ModelSerializer],
+    conflict_key: str,
+) -> list[dict[str, Any]]:
+    # Rows are matched on a natural key and written with INSERT ... ON CONFLICT DO UPDATE,
+    # one statement per chunk; the database enforces every other unique constraint.
+    batch_size = settings.SYNC_BATCH_SIZE
+    context = {'prefetched': prefetch_references(data, SerializerClass)}
+    fast_validate = compiled_validator(SerializerClass).bind(context)
+    staged: dict[Any, tuple[models.Model, set[str], Optional[list[dict]]]] = {}
+    entries: list[tuple[Any, bool]] = []
+
+    for item_data in data:
+        validated_data = fast_validate(item_data)
+        if validated_data is None:
+            validated_data = _validate_with_serializer(SerializerClass, item_data, context)
+        validated_data.pop('id', None)
+        items_data = validated_data.pop('items', None)
+        key = validated_data[conflict_key]
+
+        if key in staged:
+            # ON CONFLICT cannot touch the same row twice in one statement, so repeats merge
+            instance, fields, previous_items = staged[key]
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            fields.update(validated_data)
+            staged[key] = (instance, fields, items_data if items_data is not None else previous_items)
+            entries.append((key, False))
+        else:
+            staged[key] = (ModelClass(**validated_data), set(validated_data), items_data)
+            entries.append((key, True))
+
+    # Keys whose stored row already matches (or is newer) are left out of the write
+    existing = ModelClass.objects.in_bulk(list(staged), field_name=conflict_key) if staged else {}
+    unchanged: dict[Any, models.Model] = {}
+    written_fields: dict[Any, list[str]] = {}
+    for key, (instance, fields, _) in staged.items():
+        stored = existing.get(key)
+        values = {name: getattr(instance, name) for name in fields}
+        if stored is None:
+            written_fields[key] = sorted(fields)
+        elif is_unchanged(stored, values):
+            unchanged[key] = stored
+        else:
+            written_fields[key] = changed_fields(stored, values)
+
+    auto_now = _auto_now_fields(ModelClass)
+
+    # Rows are grouped by the fields they carry so an update never resets omitted columns
+    groups: dict[tuple[str, ...], list[models.Model]] = defaultdict(list)
+    for key, (instance, fields, _) in staged.items():
+        if key not in unchanged:
+            groups[tuple(sorted(fields))].append(instance)
+    for fields, instances in groups.items():
+        update_fields = [name for name in fields if name != conflict_key] + auto_now
+        ModelClass.objects.bulk_create(
+            instances,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=[conflict_key],
+            update_fields=update_fields or [conflict_key],
+        )
+
+    item_counts = _reconcile_nested_items(
+        ModelClass, [(unchanged.get(key, instance), items) for key, (instance, _, items) in staged.items()]
+    )
+
+    results: list[dict[str, Any]] = []
+    for key, first in entries:
+        if key in unchanged:
+            results.append(_result(unchanged[key], 'unchanged', item_counts))
+            continue
+        instance = staged[key][0]
+        # Existence was read in this write transaction, which holds the SQLite write lock
+        # from BEGIN IMMEDIATE on, so no other writer can insert the key in between
+        status = 'created' if first and key not in existing else 'updated'
+        results.append(_result(instance, status, item_counts, written_fields[key]))
+    return results
+
+
+def _reconcile_nested_items(
+    ModelClass: type[models.Model], nested_items: list[tuple[models.Model, Optional[list[dict]]]]
+) -> dict[int, dict[str, int]]:
+    # Items are reconciled only for orders whose payload carried an 'items' key
+    if ModelClass is not Order:
+        return {}
+    orders = [(order, items) for order, items in nested_items if items is not None]
+    return reconcile_order_items(orders) if orders else {}
+
+
+def _result(
+    instance: models.Model, status: str, item_counts: dict[int, dict[str, int]], fields: Iterable[str] = ()
+) -> dict[str, Any]:
+    # 'fields' lists the columns the write changed; the sync service moves it into the
+    # change log and leaves it out of the response
+    result: dict[str, Any] = {'id': instance.pk, 'status': status, 'fields': list(fields)}
+    if instance.pk in item_counts:
+        result['items'] = item_counts[instance.pk]
+        if any(item_counts[instance.pk].values()):
+            result['fields'].append('items')
+            # An order whose own columns match still counts as updated when its lines changed
+            if status == 'unchanged':
+                result['status'] = 'updated'
+    return result
@@ -0,0 +1,44 @@
+from typing import Any
+from django.db import models
+from django.db.models import Max
+
+from .models import Customer, Employee, Order, Product
+
+# Upstream modification stamps, in order of preference. A row whose stamp is not newer
+# than the stored one is skipped without comparing its content.
+WATERMARK_FIELDS: dict[type[models.Model], tuple[str, ...]] = {
+    Employee: ('last_modified', 'last_modified_on'),
+}
+
+# Columns reported by the watermarks endpoint so clients can send only newer rows
+HIGH_WATER_MARK_FIELDS: dict[type[models.Model], tuple[str, ...]] = {
+    Customer: ('updated_at',),
+    Product: ('updated_at',),
+    Order: ('updated_at',),
+    Employee: ('last_modified', 'last_modified_on'),
+}
+
+
+def _same_value(instance: models.Model, name: str, value: Any) -> bool:
+    field = instance._meta.get_field(name)
+    if field.is_relation:
+        # Compare foreign keys by id so the related row is never loaded
+        return getattr(instance, field.attname) == (value.pk if value is not None else None)
+    return getattr(instance, name) == value
+
+
+def is_unchanged(instance: models.Model, validated_data: dict) -> bool:
+    for name in WATERMARK_FIELDS.get(type(instance), ()):
+        incoming, stored = validated_data.get(name), getattr(instance, name)
+        if incoming is not None and stored is not None:
+            return incoming <= stored
+    return all(_same_value(instance, name, value) for name, value in validated_data.items())
+
+
+def changed_fields(instance: models.Model, validated_data: dict) -> list[str]:
+    # Columns whose incoming value differs from the stored row, for the change log
+    return [name for name, value in validated_data.items() if name != 'id' and not _same_value(instance, name, value)]
+
+
+def high_water_marks(ModelClass: type[models.Model]) -> dict[str, Any]:
+    return ModelClass.objects.aggregate(**{name: Max(name) for name in HIGH_WATER_MARK_FIELDS[ModelClass]})
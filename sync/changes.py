@@ -0,0 +1,182 @@
+import base64
+from typing import Any, Iterable, Mapping, Optional, Union
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.dispatch import Signal
+from rest_framework.exceptions import ValidationError
+
+from common.db import write_transaction
+from .models import ChangeLogEntry
+
+ACTIONS = ('created', 'updated', 'deleted')
+
+# Sent once per committed write transaction, with the batch's event dict as `event`
+changes_committed = Signal()
+
+
+class ChangeBatch:
+    # Collects what one transaction wrote, per sync model name ('employees', 'orders', ...)
+    def __init__(self, source: str, history_id: Optional[int] = None) -> None:
+        self.source = source
+        self.history_id = history_id
+        self._models: dict[str, dict[str, Any]] = {}
+
+    def record(
+        self,
+        model: str,
+        created: Iterable[int] = (),
+        updated: Iterable[int] = (),
+        deleted: Iterable[int] = (),
+        fields: Union[Iterable[str], Mapping[int, Iterable[str]]] = (),
+    ) -> None:
+        # fields are either shared by every created and updated row or given per row id;
+        # the change log keeps them per row, the event carries their union
+        entry = self._models.setdefault(
+            model, {'created': [], 'updated': [], 'deleted': [], 'fields': set(), 'row_fields': {}}
+        )
+        created, updated = list(created), list(updated)
+        entry['created'].extend(created)
+        entry['updated'].extend(updated)
+        entry['deleted'].extend(deleted)
+        if not isinstance(fields, Mapping):
+            fields = dict.fromkeys([*created, *updated], list(fields))
+        for pk, names in fields.items():
+            entry['row_fields'].setdefault(pk, set()).update(names)
+            entry['fields'].update(names)
+
+    def __bool__(self) -> bool:
+        return any(entry['created'] or entry['updated'] or entry['deleted'] for entry in self._models.values())
+
+    def as_event(self) -> dict:
+        return {
+            'source': self.source,
+            'history_id': self.history_id,
+            'changes': [
+                {
+                    'model': model,
+                    'created': entry['created'],
+                    'updated': entry['updated'],
+                    'deleted': entry['deleted'],
+                    'fields': sorted(entry['fields']),
+                }
+                for model, entry in self._models.items()
+                if entry['created'] or entry['updated'] or entry['deleted']
+            ],
+        }
+
+    def finish(self) -> None:
+        # Call at the end of the write's atomic block. The change log rows commit with the
+        # data; the event is sent only after the commit, so a rollback discards both, and a
+        # failing receiver cannot undo a write that already committed.
+        if not self:
+            return
+        ChangeLogEntry.objects.bulk_create(
+            [
+                ChangeLogEntry(
+                    model=model,
+                    object_id=pk,
+                    action=action,
+                    fields=sorted(entry['row_fields'].get(pk, ())) if action != 'deleted' else [],
+                    history_id=self.history_id,
+                )
+                for model, entry in self._models.items()
+                for action in ACTIONS
+                for pk in entry[action]
+            ],
+            batch_size=settings.SYNC_BATCH_SIZE,
+        )
+        transaction.on_commit(
+            lambda: changes_committed.send(sender=ChangeBatch, event=self.as_event()), robust=True
+        )
+
+
+def encode_change_cursor(entry_id: int) -> str:
+    return base64.urlsafe_b64encode(str(entry_id).encode('ascii')).decode('ascii')
+
+
+def decode_change_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii'))
+    except (ValueError, UnicodeError) as exc:
+        raise ValidationError({'since': 'Invalid cursor.'}) from exc
+
+
+def read_changes(since: Optional[str], limit: int, model: Optional[str] = None) -> dict:
+    # Entries are read in id order after the cursor. SQLite commits one writer at a time, so
+    # an id below the cursor can never become visible later, and compaction only removes
+    # entries that a newer one for the same key supersedes.
+    after_id = decode_change_cursor(since) if since else 0
+    entries = ChangeLogEntry.objects.filter(pk__gt=after_id).order_by('pk')
+    if model:
+        entries = entries.filter(model=model)
+    rows = list(entries[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'changes': [
+            {
+                'cursor': encode_change_cursor(entry.pk),
+                'model': entry.model,
+                'id': entry.object_id,
+                'action': entry.action,
+                'fields': entry.fields,
+                'history_id': entry.history_id,
+                'changed_at': entry.changed_at.isoformat(),
+            }
+            for entry in rows
+        ],
+        # An empty page hands back the same cursor, so consumers can keep polling with it
+        'next_cursor': encode_change_cursor(rows[-1].pk) if rows else (since or encode_change_cursor(0)),
+        'has_more': has_more,
+    }
+
+
+def compact_changes(batch_size: Optional[int] = None) -> int:
+    # Drops every entry that a newer entry for the same (model, object_id) supersedes;
+    # returns the number removed. The log is walked in primary-key ranges, one short
+    # transaction in the write lane each, so syncs are never held up for the whole table.
+    batch_size = batch_size or settings.SYNC_BATCH_SIZE
+    newer = ChangeLogEntry.objects.filter(
+        model=OuterRef('model'), object_id=OuterRef('object_id'), pk__gt=OuterRef('pk')
+    )
+    removed = 0
+    last_pk = 0
+    while True:
+        with write_transaction():
+            pks = ChangeLogEntry.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)
+            pks = list(pks[:batch_size])
+            if not pks:
+                return removed
+            superseded = ChangeLogEntry.objects.filter(pk__gt=last_pk, pk__lte=pks[-1]).filter(Exists(newer))
+            entries = list(superseded.order_by('pk'))
+            _merge_into_latest(entries)
+            ChangeLogEntry.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+        removed += len(entries)
+        last_pk = pks[-1]
+
+
+def _merge_into_latest(entries: list[ChangeLogEntry]) -> None:
+    # The newest entry for a record takes over what the removed ones said: the union of
+    # their fields, and 'created' when the record did not exist before them, so a consumer
+    # that catches up from an older cursor still learns the row is new
+    removed: dict[tuple[str, int], list[ChangeLogEntry]] = {}
+    for entry in entries:
+        removed.setdefault((entry.model, entry.object_id), []).append(entry)
+
+    latest_pks = []
+    for model in {model for model, _ in removed}:
+        object_ids = [object_id for key_model, object_id in removed if key_model == model]
+        latest = ChangeLogEntry.objects.filter(model=model, object_id__in=object_ids).values('object_id')
+        latest_pks.extend(latest.annotate(latest=Max('pk')).values_list('latest', flat=True))
+
+    survivors = []
+    for survivor in ChangeLogEntry.objects.filter(pk__in=latest_pks):
+        older = removed[(survivor.model, survivor.object_id)]
+        if survivor.action == 'deleted':
+            continue
+        if older[0].action == 'created':
+            survivor.action = 'created'
+        survivor.fields = sorted(set(survivor.fields).union(*(entry.fields for entry in older)))
+        survivors.append(survivor)
+    ChangeLogEntry.objects.bulk_update(survivors, ['action', 'fields'], batch_size=settings.SYNC_BATCH_SIZE)
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterator, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+
+from .models import Customer, Employee, Order, OrderItem, Product
+
+# Column that filters an incremental pull; employees carry the upstream modification time
+EXPORT_UPDATED_FIELDS: dict[type[models.Model], str] = {
+    Customer: 'updated_at',
+    Product: 'updated_at',
+    Order: 'updated_at',
+    Employee: 'last_modified_on',
+}
+ITEM_COLUMNS = ('id', 'product_id', 'qty', 'unit_price')
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    # Full microsecond precision, so an exported timestamp can be sent back as updated_since
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class NDJSONRenderer(JSONRenderer):
+    # Export bodies are streamed by the view; renderers only take part in content
+    # negotiation and render error responses as a single JSON line
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(JSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    # Clients that ask for a type the export does not offer, such as application/json,
+    # get the first renderer (NDJSON) instead of 406
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            renderer = renderers[0]
+            return renderer, renderer.media_type
+
+
+def export_columns(ModelClass: type[models.Model]) -> list[str]:
+    columns = [field.attname for field in ModelClass._meta.concrete_fields]
+    if ModelClass is Order:
+        columns.append('items')
+    return columns
+
+
+def _attach_items(rows: list[dict]) -> None:
+    # One query per chunk of orders, however many items they have
+    items: dict[int, list[dict]] = defaultdict(list)
+    lines = OrderItem.objects.filter(order_id__in=[row['id'] for row in rows]).order_by('order_id', 'id')
+    for line in lines.values('order_id', *ITEM_COLUMNS):
+        items[line.pop('order_id')].append(line)
+    for row in rows:
+        row['items'] = items.get(row['id'], [])
+
+
+def export_chunks(
+    ModelClass: type[models.Model],
+    updated_since: Optional[datetime] = None,
+    updated_until: Optional[datetime] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[list[dict[str, Any]]]:
+    # Keyset pages on the primary key: each chunk is one indexed query, only one chunk is
+    # held in memory, and rows updated during the export neither repeat nor shift pages.
+    chunk_size = chunk_size or settings.SYNC_EXPORT_CHUNK_SIZE
+    queryset = ModelClass.objects.all()
+    updated = EXPORT_UPDATED_FIELDS[ModelClass]
+    if updated_since is not None:
+        queryset = queryset.filter(**{f'{updated}__gte': updated_since})
+    if updated_until is not None:
+        queryset = queryset.filter(**{f'{updated}__lt': updated_until})
+    columns = [field.attname for field in ModelClass._meta.concrete_fields]
+
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values(*columns)[:chunk_size])
+        if not rows:
+            return
+        if ModelClass is Order:
+            _attach_items(rows)
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1]['id']
+
+
+def ndjson_body(chunks: Iterator[list[dict[str, Any]]]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield ''.join(json.dumps(row, cls=ExportJSONEncoder) + '\n' for row in rows).encode('utf-8')
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return json.dumps(value, cls=ExportJSONEncoder)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_body(chunks: Iterator[list[dict[str, Any]]], columns: list[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        for row in rows:
+            writer.writerow([_csv_value(row[column]) for column in columns])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+async def async_body(body: Iterator[bytes]) -> AsyncIterator[bytes]:
+    # Under ASGI, Django would drain a synchronous iterator into a list before sending it;
+    # pulling one chunk at a time through sync_to_async keeps memory flat
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(body, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,219 @@
+from functools import lru_cache
+from typing import Any, Callable, Optional
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import MaxLengthValidator, MaxValueValidator, MinLengthValidator, MinValueValidator
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, empty
+from rest_framework.validators import UniqueValidator
+import rest_framework.serializers as serializers
+
+from .serializers import CamelCaseKeysMixin
+
+Coercer = Callable[[Any], Any]
+
+
+class _Fallback(Exception):
+    # Raised by a fast coercer for any input it does not handle; the DRF field takes over
+    pass
+
+
+def pop_unique_validators(serializer: serializers.Serializer) -> dict[str, UniqueValidator]:
+    # UniqueValidator costs one query per item; the batch is checked in one pass instead
+    popped: dict[str, UniqueValidator] = {}
+    for name, field in serializer.fields.items():
+        for validator in field.validators:
+            if isinstance(validator, UniqueValidator):
+                popped[name] = validator
+        if name in popped:
+            field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+    return popped
+
+
+def _remaining_validators(field: serializers.Field, inlined: dict[type, Any]) -> Optional[list]:
+    # Validators whose limit is already checked inline are dropped. None means a validator
+    # needs the serializer context, so the field is left to DRF.
+    validators = []
+    for validator in field.validators:
+        if isinstance(validator, UniqueValidator):
+            continue
+        if type(validator) in inlined and validator.limit_value == inlined[type(validator)]:
+            continue
+        if getattr(validator, 'requires_context', False):
+            return None
+        validators.append(validator)
+    return validators
+
+
+def _run(validators: list, value: Any) -> Any:
+    try:
+        for validator in validators:
+            validator(value)
+    except (ValidationError, DjangoValidationError):
+        raise _Fallback
+    return value
+
+
+def _char_coercer(field: serializers.CharField) -> Optional[Coercer]:
+    max_length, min_length = field.max_length, field.min_length
+    allow_blank, trim_whitespace = field.allow_blank, field.trim_whitespace
+    validators = _remaining_validators(field, {MaxLengthValidator: max_length, MinLengthValidator: min_length})
+    if validators is None:
+        return None
+
+    def coerce(value):
+        value_type = type(value)
+        if value_type is int or value_type is float:
+            value = str(value)
+        elif value_type is not str:
+            raise _Fallback
+        if trim_whitespace:
+            value = value.strip()
+        if not value:
+            if not allow_blank:
+                raise _Fallback
+            return ''
+        length = len(value)
+        if (max_length is not None and length > max_length) or (min_length is not None and length < min_length):
+            raise _Fallback
+        return _run(validators, value)
+
+    return coerce
+
+
+def _integer_coercer(field: serializers.IntegerField) -> Optional[Coercer]:
+    max_value, min_value = field.max_value, field.min_value
+    validators = _remaining_validators(field, {MaxValueValidator: max_value, MinValueValidator: min_value})
+    if validators is None:
+        return None
+
+    def coerce(value):
+        # bool is an int subclass but DRF rejects it, so the exact type is checked
+        if type(value) is not int:
+            raise _Fallback
+        if (max_value is not None and value > max_value) or (min_value is not None and value < min_value):
+            raise _Fallback
+        return _run(validators, value)
+
+    return coerce
+
+
+def _boolean_coercer(field: serializers.BooleanField) -> Optional[Coercer]:
+    validators = _remaining_validators(field, {})
+    if validators is None:
+        return None
+
+    def coerce(value):
+        if value is not True and value is not False:
+            raise _Fallback
+        return _run(validators, value)
+
+    return coerce
+
+
+def _choice_coercer(field: serializers.ChoiceField) -> Optional[Coercer]:
+    choices = dict(field.choice_strings_to_values)
+    validators = _remaining_validators(field, {})
+    if validators is None:
+        return None
+
+    def coerce(value):
+        if type(value) is not str or value not in choices:
+            raise _Fallback
+        return _run(validators, choices[value])
+
+    return coerce
+
+
+# Keyed on the exact class: subclasses such as IPAddressField change to_internal_value
+FAST_COERCERS: dict[type, Callable[[serializers.Field], Optional[Coercer]]] = {
+    serializers.CharField: _char_coercer,
+    serializers.EmailField: _char_coercer,
+    serializers.SlugField: _char_coercer,
+    serializers.URLField: _char_coercer,
+    serializers.RegexField: _char_coercer,
+    serializers.IntegerField: _integer_coercer,
+    serializers.BooleanField: _boolean_coercer,
+    serializers.ChoiceField: _choice_coercer,
+}
+
+
+class CompiledValidator:
+    # Built once per serializer class from its field definitions. Rows are validated in a
+    # loop without instantiating a serializer per row; any row the fast path does not
+    # accept returns None, and the caller re-validates it with the DRF serializer so that
+    # errors keep their usual format.
+    def __init__(self, SerializerClass: type[serializers.Serializer]):
+        self.SerializerClass = SerializerClass
+        serializer = SerializerClass()
+        self.key_transform = getattr(SerializerClass, 'key_transform', None)
+        self.enabled = (
+            SerializerClass.to_internal_value in (
+                serializers.Serializer.to_internal_value,
+                CamelCaseKeysMixin.to_internal_value,
+            )
+            and not serializer.validators
+        )
+        self.unique_validators = pop_unique_validators(serializer)
+        self.coercers: dict[str, Optional[Coercer]] = {}
+        for name, field in serializer.fields.items():
+            if field.read_only:
+                continue
+            compile_field = FAST_COERCERS.get(type(field))
+            self.coercers[name] = compile_field(field) if compile_field else None
+
+    def bind(self, context: dict) -> Callable[[dict], Optional[dict]]:
+        # Fields that are left to DRF (related, nested, dates, decimals) run on one
+        # serializer per batch, so they see the batch context.
+        serializer = self.SerializerClass(context=context)
+        pop_unique_validators(serializer)
+        specs = [
+            (
+                name,
+                serializer.fields[name],
+                coercer,
+                getattr(serializer, f'validate_{name}', None),
+            )
+            for name, coercer in self.coercers.items()
+        ]
+        key_transform = self.key_transform
+
+        def validate(row: dict) -> Optional[dict]:
+            if not self.enabled or not isinstance(row, dict):
+                return None
+            if key_transform is not None:
+                row = {key_transform(key): value for key, value in row.items()}
+
+            attrs: dict[str, Any] = {}
+            try:
+                for name, field, coercer, validate_method in specs:
+                    value = row.get(name, empty)
+                    if value is empty:
+                        if field.required:
+                            return None
+                        try:
+                            value = field.get_default()
+                        except SkipField:
+                            continue
+                    elif value is None:
+                        if not field.allow_null:
+                            return None
+                    elif coercer is None:
+                        value = field.run_validation(value)
+                    else:
+                        try:
+                            value = coercer(value)
+                        except _Fallback:
+                            value = field.run_validation(value)
+                    if validate_method is not None:
+                        value = validate_method(value)
+                    serializer.set_value(attrs, field.source_attrs, value)
+                return serializer.validate(attrs)
+            except (ValidationError, DjangoValidationError, SkipField):
+                return None
+
+        return validate
+
+
+@lru_cache(maxsize=None)
+def compiled_validator(SerializerClass: type[serializers.Serializer]) -> CompiledValidator:
+    return CompiledValidator(SerializerClass)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Iterator, Optional
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from sync_history.models import SyncIdempotencyKey
+from sync_history.stats import history_db
+
+logger = logging.getLogger('sync_bridge.idempotency')
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Response headers worth replaying, e.g. the Location of a queued sync
+REPLAYED_HEADERS = ('Location', 'Preference-Applied')
+
+
+class IdempotencyKeyInFlight(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_key_in_flight'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def request_fingerprint(request) -> str:
+    # Hash of the parsed body, so formatting differences between resends do not matter
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    prefer = request.headers.get('Prefer', '')
+    return hashlib.sha256(f"{request.path}\n{prefer}\n{body}".encode('utf-8')).hexdigest()
+
+
+def _lock_expiry():
+    return timezone.now() + timedelta(seconds=settings.SYNC_IDEMPOTENCY_LOCK_TIMEOUT)
+
+
+def _claim(key: str, request_hash: str) -> bool:
+    # Only this key's expired record is cleared, through the unique index;
+    # purge_expired_keys removes keys that are never sent again
+    SyncIdempotencyKey.objects.filter(key=key, expires_at__lte=timezone.now()).delete()
+    try:
+        with transaction.atomic(using=history_db()):
+            SyncIdempotencyKey.objects.create(key=key, request_hash=request_hash, expires_at=_lock_expiry())
+        return True
+    except IntegrityError:
+        return False
+
+
+@contextmanager
+def _hold(key: str) -> Iterator[None]:
+    # The in-flight lock is a lease renewed while the request runs, so a sync that takes
+    # longer than SYNC_IDEMPOTENCY_LOCK_TIMEOUT is not run twice; it only lapses when the
+    # process running the request dies
+    stop = threading.Event()
+
+    def renew() -> None:
+        try:
+            while not stop.wait(settings.SYNC_IDEMPOTENCY_LOCK_TIMEOUT / 3):
+                try:
+                    SyncIdempotencyKey.objects.filter(key=key, response_status__isnull=True).update(
+                        expires_at=_lock_expiry()
+                    )
+                except Exception as exc:
+                    logger.warning(json.dumps({'event': 'idempotency.renew_failed', 'error': str(exc)}))
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=renew, name='idempotency-lease', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def purge_expired_keys() -> int:
+    deleted, _ = SyncIdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def _wait_for(key: str) -> Optional[SyncIdempotencyKey]:
+    # Duplicates poll for the original request's outcome for up to SYNC_IDEMPOTENCY_WAIT
+    deadline = time.monotonic() + settings.SYNC_IDEMPOTENCY_WAIT
+    while True:
+        record = SyncIdempotencyKey.objects.filter(key=key).first()
+        if record is None or record.response_status is not None or time.monotonic() >= deadline:
+            return record
+        time.sleep(0.1)
+
+
+def _store(key: str, response: Response) -> None:
+    if response.status_code >= 500:
+        # Server errors are not cached, so the client's next retry runs the sync again
+        SyncIdempotencyKey.objects.filter(key=key).delete()
+        return
+    SyncIdempotencyKey.objects.filter(key=key).update(
+        response_status=response.status_code,
+        response_body=json.loads(json.dumps(response.data, default=str)),
+        response_headers={name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)},
+        expires_at=timezone.now() + timedelta(seconds=settings.SYNC_IDEMPOTENCY_TTL),
+    )
+
+
+def _replay(record: SyncIdempotencyKey) -> Response:
+    headers = dict(record.response_headers, **{'Idempotent-Replayed': 'true'})
+    return Response(record.response_body, status=record.response_status, headers=headers)
+
+
+def idempotent_response(
+    request,
+    key: str,
+    handler: Callable[[], Response],
+    handle_exception: Callable[[Exception], Response],
+) -> Response:
+    if len(key) > 255:
+        raise ValidationError({IDEMPOTENCY_HEADER: 'Must be at most 255 characters.'})
+    request_hash = request_fingerprint(request)
+
+    while not _claim(key, request_hash):
+        record = SyncIdempotencyKey.objects.filter(key=key).first()
+        if record is not None and record.request_hash != request_hash:
+            raise IdempotencyKeyReused()
+        record = _wait_for(key)
+        if record is None:
+            # The original request failed with a server error and released the key
+            continue
+        if record.response_status is None:
+            exc = IdempotencyKeyInFlight()
+            exc.wait = 1
+            raise exc
+        return _replay(record)
+
+    with _hold(key):
+        try:
+            response = handler()
+        except Exception as exc:
+            try:
+                response = handle_exception(exc)
+            except Exception:
+                SyncIdempotencyKey.objects.filter(key=key).delete()
+                raise
+        _store(key, response)
+    return response
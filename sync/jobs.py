@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+from typing import Iterable
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+
+from sync_history.models import SyncHistory, SyncStatus
+from sync_history.stats import change_status_bulk
+from .services import run_sync_job
+
+logger = logging.getLogger('sync_bridge.jobs')
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claim(queryset: QuerySet, worker: str, limit: int, **changes) -> list[SyncHistory]:
+    # A single UPDATE ... WHERE id IN (SELECT ... LIMIT n) flips the rows to processing,
+    # so concurrent workers can never claim the same row. The per-claim token lets us read
+    # back exactly the rows this call won.
+    token = f"{worker}:{uuid.uuid4().hex[:12]}"
+    now = timezone.now()
+    candidates = queryset.order_by('id').values('id')[:limit]
+    claimed = change_status_bulk(
+        queryset.filter(id__in=candidates),
+        SyncStatus.PROCESSING,
+        claimed_by=token,
+        claimed_at=now,
+        **changes,
+    )
+    if not claimed:
+        return []
+    return list(SyncHistory.objects.filter(claimed_by=token, status=SyncStatus.PROCESSING).order_by('id'))
+
+
+def claim_jobs(worker: str, limit: int) -> list[SyncHistory]:
+    return _claim(SyncHistory.objects.filter(status=SyncStatus.QUEUED), worker, limit)
+
+
+def claim_retries(worker: str, limit: int) -> list[SyncHistory]:
+    # A stream only kept its failing chunk, so replaying it would not resend the rest
+    due = SyncHistory.objects.filter(status=SyncStatus.PENDING_RETRY).filter(
+        Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=timezone.now())
+    ).exclude(options__has_key='stream')
+    return _claim(due, worker, limit, retries=F('retries') + 1, next_retry_at=None)
+
+
+def renew_leases(histories: Iterable[SyncHistory]) -> int:
+    # claimed_at is a lease: the worker renews it for the jobs it is still running, so
+    # only jobs whose worker stopped renewing are ever released
+    claims = Q()
+    for history in histories:
+        claims |= Q(pk=history.pk, claimed_by=history.claimed_by)
+    if not claims:
+        return 0
+    return SyncHistory.objects.filter(claims, status=SyncStatus.PROCESSING).update(claimed_at=timezone.now())
+
+
+def release_stale_jobs(stale_after: float) -> int:
+    # Rows whose lease was not renewed within stale_after belong to a worker that died;
+    # they go back where they came from
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = SyncHistory.objects.filter(status=SyncStatus.PROCESSING, claimed_at__lt=cutoff)
+    released = change_status_bulk(stale.filter(retries=0), SyncStatus.QUEUED, claimed_by=None, claimed_at=None)
+    released += change_status_bulk(
+        stale.filter(retries__gt=0), SyncStatus.PENDING_RETRY, claimed_by=None, claimed_at=None
+    )
+    return released
+
+
+def retry_delay(attempt: int) -> timedelta:
+    seconds = settings.SYNC_RETRY_BACKOFF * (2 ** max(attempt - 1, 0))
+    return timedelta(seconds=min(seconds, settings.SYNC_RETRY_BACKOFF_MAX))
+
+
+def execute_job(history: SyncHistory) -> None:
+    # Runs on a pool thread
+    close_old_connections()
+    try:
+        run_sync_job(history)
+    except Exception as exc:
+        logger.exception(json.dumps({'event': 'sync_job_failed', 'id': history.id, 'error': str(exc)}))
+        _fail_if_processing(history, exc)
+    finally:
+        _log('sync_job', history)
+        close_old_connections()
+
+
+def execute_retry(history: SyncHistory) -> None:
+    close_old_connections()
+    try:
+        if run_sync_job(history).get('errors'):
+            # Items that still fail are retried like a failed attempt
+            _reschedule(history)
+    except Exception as exc:
+        logger.exception(json.dumps({'event': 'sync_retry_failed', 'id': history.id, 'error': str(exc)}))
+        try:
+            rescheduled = _reschedule(history)
+        except Exception:
+            logger.exception(json.dumps({'event': 'sync_retry_not_rescheduled', 'id': history.id}))
+            rescheduled = False
+        if not rescheduled:
+            _fail_if_processing(history, exc)
+    finally:
+        _log('sync_retry', history)
+        close_old_connections()
+
+
+def _reschedule(history: SyncHistory) -> bool:
+    # Backs off exponentially until SYNC_RETRY_MAX_ATTEMPTS; past that the row keeps the
+    # failed or partial status the attempt recorded
+    if history.retries >= settings.SYNC_RETRY_MAX_ATTEMPTS:
+        return False
+    change_status_bulk(
+        SyncHistory.objects.filter(pk=history.pk),
+        SyncStatus.PENDING_RETRY,
+        next_retry_at=timezone.now() + retry_delay(history.retries),
+    )
+    history.refresh_from_db(fields=['status', 'next_retry_at'])
+    return True
+
+
+def _fail_if_processing(history: SyncHistory, exc: Exception) -> None:
+    # The sync records its own failures, but an error before it starts (an unreadable
+    # payload) or while recording one (database is locked) leaves the row in processing,
+    # where release_stale_jobs would hand it out again. The status check keeps an outcome
+    # that was recorded.
+    try:
+        change_status_bulk(
+            SyncHistory.objects.filter(pk=history.pk, status=SyncStatus.PROCESSING),
+            SyncStatus.FAILED,
+            failure_reason=str(exc)[:500],
+        )
+        history.refresh_from_db(fields=['status', 'failure_reason'])
+    except Exception:
+        logger.exception(json.dumps({'event': 'sync_job_not_recorded', 'id': history.id}))
+
+
+def _log(event: str, history: SyncHistory) -> None:
+    logger.info(json.dumps({
+        'event': event,
+        'id': history.id,
+        'status': history.status,
+        'retries': history.retries,
+        'failure_reason': history.failure_reason,
+    }))
@@ -0,0 +1,31 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sync.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Drop change log entries superseded by a newer entry for the same record.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Seconds between compactions; 0 compacts once and exits.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SYNC_BATCH_SIZE,
+            help='Entries examined per write transaction.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            removed = compact_changes(options['batch_size'])
+            self.stdout.write(f"change log: removed {removed} superseded entries")
+            if options['interval'] <= 0:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sync.idempotency import purge_expired_keys
+from sync.jobs import (
+    claim_jobs,
+    claim_retries,
+    execute_job,
+    execute_retry,
+    release_stale_jobs,
+    renew_leases,
+    worker_name,
+)
+from sync_history.models import SyncHistory
+
+
+class Command(BaseCommand):
+    help = 'Drain queued asynchronous sync jobs and due retries with a local worker pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.SYNC_WORKER_CONCURRENCY)
+        parser.add_argument(
+            '--retry-concurrency',
+            type=int,
+            default=settings.SYNC_RETRY_CONCURRENCY,
+            help='Upper bound on retries running at once; 0 disables retries.',
+        )
+        parser.add_argument('--poll-interval', type=float, default=settings.SYNC_WORKER_POLL_INTERVAL)
+        parser.add_argument('--stale-after', type=float, default=settings.SYNC_JOB_STALE_AFTER)
+        parser.add_argument('--once', action='store_true', help='Exit once nothing is queued or due.')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        retry_concurrency = min(max(0, options['retry_concurrency']), concurrency)
+        poll_interval = options['poll_interval']
+        worker = worker_name()
+        self.stdout.write(
+            f"sync_worker {worker} started with concurrency={concurrency} retry_concurrency={retry_concurrency}"
+        )
+
+        # Running futures with the history row each one claimed
+        jobs: dict[Future, SyncHistory] = {}
+        retries: dict[Future, SyncHistory] = {}
+        # Leases are renewed well before they could be taken for stale
+        renew_every = options['stale_after'] / 4
+        renewed_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sync-worker') as pool:
+            try:
+                while True:
+                    if time.monotonic() - renewed_at >= renew_every:
+                        renew_leases([*jobs.values(), *retries.values()])
+                        # Idempotency-Key records that are never sent again expire on the same timer
+                        purge_expired_keys()
+                        renewed_at = time.monotonic()
+                    release_stale_jobs(options['stale_after'])
+
+                    free = concurrency - len(jobs) - len(retries)
+                    for job in claim_jobs(worker, free) if free > 0 else []:
+                        jobs[pool.submit(execute_job, job)] = job
+
+                    # Retries share the pool but are capped separately so a backlog of
+                    # failures cannot crowd out fresh jobs on the single SQLite writer
+                    free = min(concurrency - len(jobs) - len(retries), retry_concurrency - len(retries))
+                    for history in claim_retries(worker, free) if free > 0 else []:
+                        retries[pool.submit(execute_retry, history)] = history
+
+                    if not jobs and not retries:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    wait([*jobs, *retries], timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    jobs = {future: job for future, job in jobs.items() if not future.done()}
+                    retries = {future: job for future, job in retries.items() if not future.done()}
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping; waiting for running jobs to finish')
+                running = {**jobs, **retries}
+                while running:
+                    wait(running, timeout=renew_every)
+                    running = {future: job for future, job in running.items() if not future.done()}
+                    renew_leases(running.values())
@@ -0,0 +1,66 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# External-content FTS5 index over sync_employee. Triggers keep it current for every
+# write path (ORM saves, bulk_create/bulk_update and ON CONFLICT upserts alike).
+COLUMNS = ['first_name', 'middle_name', 'last_name', 'email', 'department', 'job_title']
+
+CREATE_STATEMENTS = [
+    "CREATE VIRTUAL TABLE sync_employee_fts USING fts5("
+    f"{', '.join(COLUMNS)}, content='sync_employee', content_rowid='id', "
+    "tokenize='unicode61', prefix='2 3')",
+    "CREATE TRIGGER sync_employee_fts_ai AFTER INSERT ON sync_employee BEGIN "
+    f"INSERT INTO sync_employee_fts(rowid, {', '.join(COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + c for c in COLUMNS)}); END",
+    "CREATE TRIGGER sync_employee_fts_ad AFTER DELETE ON sync_employee BEGIN "
+    f"INSERT INTO sync_employee_fts(sync_employee_fts, rowid, {', '.join(COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + c for c in COLUMNS)}); END",
+    f"CREATE TRIGGER sync_employee_fts_au AFTER UPDATE OF {', '.join(COLUMNS)} ON sync_employee BEGIN "
+    f"INSERT INTO sync_employee_fts(sync_employee_fts, rowid, {', '.join(COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + c for c in COLUMNS)}); "
+    f"INSERT INTO sync_employee_fts(rowid, {', '.join(COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + c for c in COLUMNS)}); END",
+    "INSERT INTO sync_employee_fts(sync_employee_fts) VALUES ('rebuild')",
+]
+
+DROP_STATEMENTS = [
+    'DROP TRIGGER IF EXISTS sync_employee_fts_ai',
+    'DROP TRIGGER IF EXISTS sync_employee_fts_ad',
+    'DROP TRIGGER IF EXISTS sync_employee_fts_au',
+    'DROP TABLE IF EXISTS sync_employee_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)')
+            cursor.execute('DROP TABLE temp.fts5_probe')
+        except OperationalError:
+            # SQLite built without FTS5; searches fall back to icontains filters
+            return
+        for statement in CREATE_STATEMENTS:
+            cursor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in DROP_STATEMENTS:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0004_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeSearchIndex',
+            fields=[
+                ('employee', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='sync.employee')),
+            ],
+            options={
+                'db_table': 'sync_employee_fts',
+                'managed': False,
+            },
+        ),
+    ]
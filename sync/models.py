@@ -78,3 +78,47 @@ class Employee(models.Model):
 
     def __str__(self) -> str:
         return self.email
+
+
+class EmployeeSearchIndex(models.Model):
+    # The FTS5 index created by migration 0002 and kept current by triggers. Unmanaged; it
+    # exists so searches can join it (see sync.search). Absent when SQLite lacks FTS5.
+    employee = models.OneToOneField(
+        Employee,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_index',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'sync_employee_fts'
+
+
+class ModelVersion(models.Model):
+    # Bumped in the same transaction as every write to `label`, so readers can tell
+    # whether anything derived from that model is stale
+    label = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.label}@{self.version}"
+
+
+class ChangeLogEntry(models.Model):
+    # Written in the same transaction as the change it describes. Ids only grow, so the id
+    # is the resumable cursor; compaction keeps the latest entry per (model, object_id).
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=16)
+    fields = models.JSONField(default=list, blank=True)
+    history_id = models.BigIntegerField(blank=True, null=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'object_id'])]
+
+    def __str__(self) -> str:
+        return f"{self.model}#{self.object_id} {self.action}"
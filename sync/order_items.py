@@ -0,0 +1,78 @@
+from collections import defaultdict
+from typing import Optional
+from django.conf import settings
+
+from .models import Order, OrderItem
+
+
+def _item_changed(item: OrderItem, item_data: dict) -> bool:
+    return (
+        item.product_id != item_data['product'].pk
+        or item.qty != item_data['qty']
+        or item.unit_price != item_data['unit_price']
+    )
+
+
+def _match_item(
+    item_data: dict,
+    unmatched: dict[int, OrderItem],
+    by_product: dict[int, list[OrderItem]],
+) -> Optional[OrderItem]:
+    item_id = item_data.pop('id', None)
+    if item_id is not None:
+        # An id that does not belong to this order is treated as a new line
+        return unmatched.pop(item_id, None)
+    candidates = by_product.get(item_data['product'].pk, [])
+    while candidates:
+        candidate = candidates.pop(0)
+        if candidate.pk in unmatched:
+            return unmatched.pop(candidate.pk)
+    return None
+
+
+def reconcile_order_items(orders: list[tuple[Order, list[dict]]]) -> dict[int, dict[str, int]]:
+    # Lines are matched by id, or by (order, product) when no id is sent. Identical lines
+    # are left alone, changed lines are bulk-updated and only missing lines are deleted.
+    batch_size = settings.SYNC_BATCH_SIZE
+    latest = {order.pk: (order, items_data) for order, items_data in orders}
+    counts = {pk: {'inserted': 0, 'updated': 0, 'removed': 0} for pk in latest}
+
+    existing: dict[int, list[OrderItem]] = defaultdict(list)
+    order_ids = list(latest)
+    for start in range(0, len(order_ids), batch_size):
+        chunk = order_ids[start:start + batch_size]
+        for item in OrderItem.objects.filter(order_id__in=chunk).order_by('id'):
+            existing[item.order_id].append(item)
+
+    to_create: list[OrderItem] = []
+    to_update: list[OrderItem] = []
+    to_delete: list[int] = []
+    for order_id, (order, items_data) in latest.items():
+        unmatched = {item.pk: item for item in existing.get(order_id, [])}
+        by_product: dict[int, list[OrderItem]] = defaultdict(list)
+        for item in unmatched.values():
+            by_product[item.product_id].append(item)
+
+        for item_data in items_data:
+            item_data = dict(item_data)
+            item = _match_item(item_data, unmatched, by_product)
+            if item is None:
+                to_create.append(OrderItem(order=order, **item_data))
+                counts[order_id]['inserted'] += 1
+            elif _item_changed(item, item_data):
+                for attr, value in item_data.items():
+                    setattr(item, attr, value)
+                to_update.append(item)
+                counts[order_id]['updated'] += 1
+
+        to_delete.extend(unmatched)
+        counts[order_id]['removed'] += len(unmatched)
+
+    if to_create:
+        OrderItem.objects.bulk_create(to_create, batch_size=batch_size)
+    if to_update:
+        OrderItem.objects.bulk_update(to_update, ['product', 'qty', 'unit_price'], batch_size=batch_size)
+    for start in range(0, len(to_delete), batch_size):
+        OrderItem.objects.filter(pk__in=to_delete[start:start + batch_size]).delete()
+
+    return counts
@@ -0,0 +1,52 @@
+import re
+from django.db import connections, router
+from django.db.models import BooleanField, FloatField, Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .models import Employee, EmployeeSearchIndex
+
+EMPLOYEE_FTS_TABLE = EmployeeSearchIndex._meta.db_table
+# bm25 weights per indexed column: names and email outrank department and job title
+EMPLOYEE_FTS_WEIGHTS = (10.0, 5.0, 10.0, 8.0, 2.0, 2.0)
+MAX_SEARCH_TERMS = 8
+
+# Aliases known to have the index. A missing index is looked up again on every search,
+# so migrating a running process picks it up.
+_fts_aliases: set[str] = set()
+
+
+def employee_fts_available() -> bool:
+    # The migration skips the index when SQLite lacks FTS5, so its presence decides
+    alias = router.db_for_read(Employee)
+    if alias not in _fts_aliases:
+        connection = connections[alias]
+        if connection.vendor == 'sqlite' and EMPLOYEE_FTS_TABLE in connection.introspection.table_names():
+            _fts_aliases.add(alias)
+    return alias in _fts_aliases
+
+
+def fts_query(search: str) -> str:
+    # Every term is quoted, so FTS operators typed by users are matched literally, and
+    # starred for prefix matching; terms are ANDed.
+    terms = re.findall(r'\w+', search)[:MAX_SEARCH_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_employees(search: str) -> QuerySet:
+    queryset = Employee.objects.all()
+    query = fts_query(search)
+    if not query or not employee_fts_available():
+        return queryset.filter(
+            Q(first_name__icontains=search)
+            | Q(last_name__icontains=search)
+            | Q(email__icontains=search)
+        )
+
+    # Joins the index on rowid; MATCH and bm25 are SQLite functions of the joined table
+    weights = ', '.join(str(weight) for weight in EMPLOYEE_FTS_WEIGHTS)
+    return (
+        queryset.filter(search_index__isnull=False)
+        .filter(RawSQL(f'{EMPLOYEE_FTS_TABLE} MATCH %s', [query], output_field=BooleanField()))
+        .annotate(search_rank=RawSQL(f'bm25({EMPLOYEE_FTS_TABLE}, {weights})', [], output_field=FloatField()))
+        .order_by('search_rank', 'id')
+    )
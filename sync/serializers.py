@@ -1,12 +1,100 @@
 import re
 from decimal import Decimal
+from functools import lru_cache
 from rest_framework import serializers
 from .models import Customer, Product, Order, OrderItem, Employee
+from .order_items import reconcile_order_items
 
 
-class SyncRequestSerializer(serializers.Serializer):
-    model = serializers.ChoiceField(choices=['customers', 'products', 'orders', 'employees'])
+# Model names accepted by the sync, export, change log and stats endpoints
+SYNC_MODELS = ('customers', 'products', 'orders', 'employees')
+
+# Natural keys usable with ON CONFLICT; each must be backed by a unique index.
+NATURAL_KEYS: dict[str, tuple[str, ...]] = {
+    'customers': ('email',),
+    'products': ('name',),
+    'orders': ('order_number',),
+    'employees': ('email',),
+}
+
+
+CAMEL_CASE_BOUNDARY = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+@lru_cache(maxsize=1024)
+def camel_to_snake(key: str) -> str:
+    # Payloads reuse the same handful of keys, so conversions are cached
+    return CAMEL_CASE_BOUNDARY.sub('_', key).lower()
+
+
+class CamelCaseKeysMixin:
+    key_transform = staticmethod(camel_to_snake)
+
+    def to_internal_value(self, data):
+        return super().to_internal_value({self.key_transform(key): value for key, value in data.items()})
+
+
+class SyncOptionsSerializer(serializers.Serializer):
+    model = serializers.ChoiceField(choices=SYNC_MODELS)
+    conflict_key = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        conflict_key = attrs.get('conflict_key')
+        if conflict_key and conflict_key not in NATURAL_KEYS[attrs['model']]:
+            allowed = ', '.join(NATURAL_KEYS[attrs['model']])
+            raise serializers.ValidationError({'conflict_key': f"Must be one of: {allowed}"})
+        return attrs
+
+
+class SyncRequestSerializer(SyncOptionsSerializer):
     data = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    partial = serializers.BooleanField(required=False, default=False)
+
+
+class SyncStreamSerializer(SyncOptionsSerializer):
+    chunk_size = serializers.IntegerField(required=False, min_value=1, max_value=50000)
+
+
+class SyncStatsQuerySerializer(serializers.Serializer):
+    model = serializers.ChoiceField(choices=SYNC_MODELS, required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    granularity = serializers.ChoiceField(choices=['minute', 'hour'], default='hour')
+
+
+class SyncWatermarksQuerySerializer(serializers.Serializer):
+    model = serializers.ChoiceField(choices=SYNC_MODELS, required=False)
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    since = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=5000, default=500)
+    model = serializers.ChoiceField(choices=SYNC_MODELS, required=False)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    model = serializers.ChoiceField(choices=SYNC_MODELS)
+    updated_since = serializers.DateTimeField(required=False)
+    updated_until = serializers.DateTimeField(required=False)
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    # Resolves against instances loaded up front into context['prefetched'] and only
+    # falls back to a query per value when the batch was not prefetched.
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.get_queryset().model)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = prefetched.get(pk)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
 
 
 class CustomerSyncSerializer(serializers.ModelSerializer):
@@ -29,7 +117,9 @@ class ProductSyncSerializer(serializers.ModelSerializer):
 
 
 class OrderItemSyncSerializer(serializers.ModelSerializer):
-    product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all(), source='product')
+    # Writable so order updates can match existing lines by id
+    id = serializers.IntegerField(required=False)
+    product_id = PrefetchedPrimaryKeyRelatedField(queryset=Product.objects.all(), source='product')
 
     class Meta:
         model = OrderItem
@@ -42,7 +132,7 @@ class OrderItemSyncSerializer(serializers.ModelSerializer):
 
 class OrderSyncSerializer(serializers.ModelSerializer):
     items = OrderItemSyncSerializer(many=True, required=False)
-    customer_id = serializers.PrimaryKeyRelatedField(queryset=Customer.objects.all(), source='customer')
+    customer_id = PrefetchedPrimaryKeyRelatedField(queryset=Customer.objects.all(), source='customer')
 
     class Meta:
         model = Order
@@ -75,8 +165,7 @@ class OrderSyncSerializer(serializers.ModelSerializer):
         items_data = validated_data.pop('items', [])
         order = Order.objects.create(**validated_data)
         if items_data:
-            order_items = [OrderItem(order=order, **item_data) for item_data in items_data]
-            OrderItem.objects.bulk_create(order_items)
+            reconcile_order_items([(order, items_data)])
         return order
 
     def update(self, instance, validated_data):
@@ -84,31 +173,20 @@ class OrderSyncSerializer(serializers.ModelSerializer):
         # Update the Order instance fields using the parent class method
         instance = super().update(instance, validated_data)
 
-        # Replace items only if 'items' key was present in the payload
+        # Reconcile items only if 'items' key was present in the payload
         if items_data is not None:
-            instance.items.all().delete()
-            if items_data:
-                order_items = [OrderItem(order=instance, **item_data) for item_data in items_data]
-                OrderItem.objects.bulk_create(order_items)
+            reconcile_order_items([(instance, items_data)])
 
         return instance
 
 
-class EmployeeSyncSerializer(serializers.ModelSerializer):
+class EmployeeSyncSerializer(CamelCaseKeysMixin, serializers.ModelSerializer):
     id = serializers.CharField(required=False, allow_null=True)
 
     class Meta:
         model = Employee
         fields = '__all__'
 
-    def to_internal_value(self, data):
-        new_data = {}
-        for key, value in data.items():
-            # covert camelCase to snake_case
-            new_key = re.sub(r'(?<!^)(?=[A-Z])', '_', key).lower()
-            new_data[new_key] = value
-        return super().to_internal_value(new_data)
-
     def validate_id(self, value):
         if value is None:
             return value
@@ -1,17 +1,25 @@
 import json
-from typing import Any
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
 from rest_framework.exceptions import ValidationError
-from django.db import transaction, models
+from django.conf import settings
+from django.db import IntegrityError, transaction
 import rest_framework.serializers as serializers
 
-from .models import Customer, Product, Order, OrderItem, Employee
+from common.db import write_transaction
+from common.exceptions import item_errors
+from .bulk import bulk_upsert, bulk_upsert_on_conflict
+from .changes import ChangeBatch
 from .serializers import (
     CustomerSyncSerializer,
     ProductSyncSerializer,
     OrderSyncSerializer,
     EmployeeSyncSerializer,
 )
+from .versions import bump_version
 from sync_history.models import SyncHistory, SyncStatus
+from sync_history.stats import change_status, create_history
 
 
 MODEL_SERIALIZERS: dict[str, serializers.ModelSerializer] = {
@@ -20,68 +28,267 @@ MODEL_SERIALIZERS: dict[str, serializers.ModelSerializer] = {
     'orders': OrderSyncSerializer,
     'employees': EmployeeSyncSerializer,
 }
+SERIALIZER_MODELS = {SerializerClass: model for model, SerializerClass in MODEL_SERIALIZERS.items()}
 
 
-def sync_payload(model: str, data: list[dict]) -> dict:
-    history = SyncHistory.objects.create(payload=json.dumps(data), status=SyncStatus.PENDING_RETRY)
+def sync_payload(model: str, data: list[dict], conflict_key: Optional[str] = None, partial: bool = False) -> dict:
+    history = create_history(
+        model=model,
+        options=_options(conflict_key, partial),
+        payload=json.dumps(data),
+        status=SyncStatus.PROCESSING,
+    )
+    return _execute(history, data)
 
-    SerializerClass = MODEL_SERIALIZERS.get(model)
-    if not SerializerClass:
-        history.status = SyncStatus.INVALID
-        history.failure_reason = f"Invalid model: {model}"
-        history.save(update_fields=['status', 'failure_reason', 'updated_at'])
-        raise ValidationError(f"Invalid model: {model}")
 
-    ModelClass = SerializerClass.Meta.model
+def enqueue_sync(
+    model: str, data: list[dict], conflict_key: Optional[str] = None, partial: bool = False
+) -> SyncHistory:
+    # The history row doubles as the job; a sync_worker process claims and runs it
+    return create_history(
+        model=model,
+        options=_options(conflict_key, partial),
+        payload=json.dumps(data),
+        status=SyncStatus.QUEUED,
+    )
+
+
+def run_sync_job(history: SyncHistory) -> dict:
+    # After a partial sync only the items that failed are replayed
+    data = json.loads(history.payload)
+    indexes = history.failed_items or list(range(len(data)))
+    return _execute(history, [data[index] for index in indexes], indexes)
+
+
+def _execute(history: SyncHistory, data: list[dict], indexes: Optional[list[int]] = None) -> dict:
+    started = time.perf_counter()
+    SerializerClass = _resolve_serializer(history, history.model)
+    conflict_key = history.options.get('conflict_key')
+    indexes = indexes or list(range(len(data)))
+
+    results: list[dict] = []
+    errors: list[dict] = []
+    try:
+        if history.options.get('partial'):
+            _write_partial(history, data, indexes, SerializerClass, conflict_key, results, errors)
+        else:
+            with _write_transaction(history) as changes:
+                results = _write_batch(data, SerializerClass, conflict_key, changes)
+    except Exception as exc:
+        fields = {}
+        if history.options.get('partial'):
+            # Chunks committed before the error stay written; a retry replays the rest
+            written = {result['index'] for result in results}
+            fields['failed_items'] = [index for index in indexes if index not in written]
+        _mark_failed(history, exc, items=len(data), duration_ms=_elapsed_ms(started), **fields)
+        raise
+
+    if errors:
+        change_status(
+            history,
+            SyncStatus.PARTIAL if results else SyncStatus.FAILED,
+            items=len(data),
+            duration_ms=_elapsed_ms(started),
+            failure_reason=json.dumps(errors)[:500],
+            failed_items=[error['index'] for error in errors],
+        )
+        return {'results': results, 'errors': errors}
+
+    change_status(
+        history,
+        SyncStatus.SUCCESSFUL,
+        items=len(data),
+        duration_ms=_elapsed_ms(started),
+        failure_reason=None,
+        failed_items=[],
+    )
+    return {'results': results}
+
 
+def _write_partial(
+    history: SyncHistory,
+    data: list[dict],
+    indexes: list[int],
+    SerializerClass: type[serializers.ModelSerializer],
+    conflict_key: Optional[str],
+    results: list[dict],
+    errors: list[dict],
+) -> None:
+    # Each chunk is first written in one savepoint. Only a chunk that fails is rewritten
+    # with a savepoint per item, so clean chunks keep the bulk write path. Results and
+    # errors are appended once their chunk commits, so after any other error they still
+    # describe exactly what was written.
+    batch_size = settings.SYNC_BATCH_SIZE
+    for start in range(0, len(data), batch_size):
+        chunk = data[start:start + batch_size]
+        chunk_indexes = indexes[start:start + batch_size]
+        try:
+            with _write_transaction(history) as changes:
+                chunk_results = _write_batch(chunk, SerializerClass, conflict_key, changes)
+            results.extend({'index': index, **result} for index, result in zip(chunk_indexes, chunk_results))
+            continue
+        except (ValidationError, IntegrityError):
+            pass
+
+        chunk_results, chunk_errors = [], []
+        with _write_transaction(history) as changes:
+            for index, item in zip(chunk_indexes, chunk):
+                try:
+                    with transaction.atomic():
+                        [result] = _write_batch([item], SerializerClass, conflict_key, changes)
+                    chunk_results.append({'index': index, **result})
+                except (ValidationError, IntegrityError) as exc:
+                    chunk_errors.append({'index': index, 'errors': item_errors(exc)})
+        results.extend(chunk_results)
+        errors.extend(chunk_errors)
+
+
+def sync_stream(model: str, lines: Iterable[bytes], chunk_size: int, conflict_key: Optional[str] = None) -> dict:
+    # Rows are read one line at a time and committed chunk by chunk, so memory is bounded
+    # by chunk_size. Only the chunk that fails is kept as the history payload, so the entry
+    # is marked as a stream and never replayed.
+    started = time.perf_counter()
+    history = create_history(
+        model=model,
+        options=_options(conflict_key, stream=True),
+        payload='',
+        status=SyncStatus.PROCESSING,
+    )
+    SerializerClass = _resolve_serializer(history, model)
+
+    summary = {'history_id': history.id, 'items': 0, 'chunks': 0, 'created': 0, 'updated': 0, 'unchanged': 0}
+    chunk: list[dict] = []
     try:
-        with transaction.atomic():
-            results = _process_sync_data(data, model, ModelClass, SerializerClass)
+        for row in _iter_ndjson(lines):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                _commit_chunk(history, chunk, SerializerClass, conflict_key, summary)
+                chunk = []
+        if chunk:
+            _commit_chunk(history, chunk, SerializerClass, conflict_key, summary)
+            chunk = []
 
-        history.status = SyncStatus.SUCCESSFUL
-        history.save(update_fields=['status', 'updated_at'])
-        return {'results': results}
+        change_status(
+            history, SyncStatus.SUCCESSFUL, items=summary['items'], duration_ms=_elapsed_ms(started)
+        )
+        return summary
     except Exception as exc:
-        history.status = SyncStatus.FAILED
-        failure_text = str(exc)
-        if isinstance(exc, ValidationError):
-            # For validation errors, serialize the details for a more informative reason.
-            failure_text = json.dumps(exc.detail)
-        history.failure_reason = failure_text[:500]
-        history.save(update_fields=['status', 'failure_reason', 'updated_at'])
+        _mark_failed(
+            history,
+            exc,
+            items=summary['items'] + len(chunk),
+            duration_ms=_elapsed_ms(started),
+            payload=json.dumps(chunk),
+        )
+        if isinstance(exc, ValidationError) and isinstance(exc.detail, dict):
+            exc.detail['committed_items'] = history.processed_items
         raise
 
-def _process_sync_data(
-    data: list[dict], model_name: str, ModelClass: type[models.Model], SerializerClass: type[serializers.ModelSerializer]
-) -> list[dict[str, Any]]:
-    results: list[dict[str, Any]] = []
-    for item_data in data:
-        instance = None
-        item_id = item_data.get('id')
-
-        # The Employee serializer handles string IDs, but we need an int for the DB query
-        if model_name == 'employees' and item_id is not None:
-            try:
-                item_id = int(item_id)
-            except (ValueError, TypeError):
-                # Let the serializer's validation catch the invalid ID format
-                pass
-
-        if item_id is not None:
-            try:
-                instance = ModelClass.objects.get(id=item_id)
-            except ModelClass.DoesNotExist:
-                # This is fine, it will be treated as a create operation,
-                # mimicking update_or_create behavior.
-                pass
-
-        serializer = SerializerClass(instance=instance, data=item_data)
-        serializer.is_valid(raise_exception=True)
-        obj = serializer.save()
-
-        status = 'updated' if instance else 'created'
-        results.append({'id': obj.id, 'status': status})
+
+def _commit_chunk(
+    history: SyncHistory,
+    chunk: list[dict],
+    SerializerClass: type[serializers.ModelSerializer],
+    conflict_key: Optional[str],
+    summary: dict,
+) -> None:
+    with _write_transaction(history) as changes:
+        results = _write_batch(chunk, SerializerClass, conflict_key, changes)
+
+    for result in results:
+        summary[result['status']] += 1
+    summary['items'] += len(chunk)
+    summary['chunks'] += 1
+
+    history.processed_items = summary['items']
+    history.committed_chunks = summary['chunks']
+    history.save(update_fields=['processed_items', 'committed_chunks', 'updated_at'])
+
+
+def _iter_ndjson(lines: Iterable[bytes]) -> Iterator[dict]:
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            raise ValidationError({'line': f"Line {line_number} is not valid JSON"}) from exc
+        if not isinstance(row, dict):
+            raise ValidationError({'line': f"Line {line_number} must be a JSON object"})
+        yield row
+
+
+def _options(conflict_key: Optional[str], partial: bool = False, stream: bool = False) -> dict:
+    options = {}
+    if conflict_key:
+        options['conflict_key'] = conflict_key
+    if partial:
+        options['partial'] = True
+    if stream:
+        options['stream'] = True
+    return options
+
+
+def _resolve_serializer(history: SyncHistory, model: str) -> type[serializers.ModelSerializer]:
+    SerializerClass = MODEL_SERIALIZERS.get(model)
+    if not SerializerClass:
+        change_status(history, SyncStatus.INVALID, failure_reason=f"Invalid model: {model}")
+        raise ValidationError(f"Invalid model: {model}")
+    return SerializerClass
+
+
+@contextmanager
+def _write_transaction(history: SyncHistory) -> Iterator[ChangeBatch]:
+    # History and stats writes stay outside the lane; only the data transaction queues.
+    # What the transaction wrote is announced once, after it commits.
+    changes = ChangeBatch('sync', history.id)
+    with write_transaction():
+        yield changes
+        changes.finish()
+
+
+def _write_batch(
+    data: list[dict],
+    SerializerClass: type[serializers.ModelSerializer],
+    conflict_key: Optional[str],
+    changes: ChangeBatch,
+) -> list[dict]:
+    ModelClass = SerializerClass.Meta.model
+    if conflict_key:
+        results = bulk_upsert_on_conflict(data, ModelClass, SerializerClass, conflict_key)
+    else:
+        results = bulk_upsert(data, ModelClass, SerializerClass)
+    # Runs inside the caller's transaction; a batch of unchanged rows leaves caches valid
+    if any(result['status'] != 'unchanged' for result in results):
+        bump_version(ModelClass)
+    _record_changes(changes, results, SerializerClass)
     return results
 
 
+def _record_changes(
+    changes: ChangeBatch, results: list[dict], SerializerClass: type[serializers.ModelSerializer]
+) -> None:
+    # The bulk writers report the columns each row actually changed
+    written = [result for result in results if result['status'] != 'unchanged']
+    changes.record(
+        SERIALIZER_MODELS[SerializerClass],
+        created=[result['id'] for result in written if result['status'] == 'created'],
+        updated=[result['id'] for result in written if result['status'] == 'updated'],
+        fields={result['id']: result['fields'] for result in written},
+    )
+    for result in results:
+        del result['fields']
+
+
+def _mark_failed(history: SyncHistory, exc: Exception, items: int = 0, duration_ms: int = 0, **fields) -> None:
+    failure_text = str(exc)
+    if isinstance(exc, ValidationError):
+        # For validation errors, serialize the details for a more informative reason.
+        failure_text = json.dumps(exc.detail)
+    change_status(
+        history, SyncStatus.FAILED, items=items, duration_ms=duration_ms, failure_reason=failure_text[:500], **fields
+    )
+
 
+def _elapsed_ms(started: float) -> int:
+    return int((time.perf_counter() - started) * 1000)
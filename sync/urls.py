@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import SyncView, SyncStatsView
+from .views import ChangesView, ExportView, SyncView, SyncStatsView, SyncWatermarksView
 
 urlpatterns = [
     path('sync', SyncView.as_view(), name='sync'),
     path('sync/stats', SyncStatsView.as_view(), name='sync-stats'),
+    path('sync/watermarks', SyncWatermarksView.as_view(), name='sync-watermarks'),
+    path('changes', ChangesView.as_view(), name='changes'),
+    path('export/<str:model>', ExportView.as_view(), name='export'),
 ]
@@ -0,0 +1,16 @@
+from django.db.models import F, Model
+
+from .models import ModelVersion
+
+
+def bump_version(ModelClass: type[Model]) -> None:
+    # Call inside the write's transaction: the new version commits together with the data
+    label = ModelClass._meta.label_lower
+    if not ModelVersion.objects.filter(label=label).update(version=F('version') + 1):
+        ModelVersion.objects.get_or_create(label=label, defaults={'version': 1})
+
+
+def model_versions(*models: type[Model]) -> tuple[int, ...]:
+    labels = [ModelClass._meta.label_lower for ModelClass in models]
+    versions = dict(ModelVersion.objects.filter(label__in=labels).values_list('label', 'version'))
+    return tuple(versions.get(label, 0) for label in labels)
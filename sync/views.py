@@ -1,31 +1,179 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Count
-from common.responses import ok
+from django.db.models import Sum
+from django.urls import reverse
+from common.responses import ok, response_with_status
 from common.monitoring import monitored
-from .serializers import SyncRequestSerializer
-from .services import sync_payload
-from sync_history.models import SyncHistory
+from .change_detection import high_water_marks
+from .changes import read_changes
+from .export import (
+    CSVRenderer,
+    ExportContentNegotiation,
+    NDJSONRenderer,
+    async_body,
+    csv_body,
+    export_chunks,
+    export_columns,
+    ndjson_body,
+)
+from .idempotency import IDEMPOTENCY_HEADER, idempotent_response
+from .serializers import (
+    ChangesQuerySerializer,
+    ExportQuerySerializer,
+    SyncRequestSerializer,
+    SyncStatsQuerySerializer,
+    SyncStreamSerializer,
+    SyncWatermarksQuerySerializer,
+)
+from .services import MODEL_SERIALIZERS, enqueue_sync, sync_payload, sync_stream
+from sync_history.models import SyncStatsBucket, SyncStatusCount
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
 
 
 class SyncView(APIView):
     @monitored('sync.operation', tags=['model'])
     def post(self, request):
+        if request.content_type.split(';')[0].strip() == NDJSON_CONTENT_TYPE:
+            return self.post_stream(request)
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key:
+            return idempotent_response(request, key, lambda: self.post_batch(request), self.handle_exception)
+        return self.post_batch(request)
+
+    def post_batch(self, request):
         serializer = SyncRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         payload = serializer.validated_data
-        result = sync_payload(payload['model'], payload['data'])
+
+        if 'respond-async' in request.headers.get('Prefer', ''):
+            history = enqueue_sync(payload['model'], payload['data'], payload.get('conflict_key'), payload['partial'])
+            location = reverse('sync-history-detail', kwargs={'history_id': history.id})
+            body = response_with_status(status.HTTP_202_ACCEPTED, 'Sync accepted', {'id': history.id, 'status': history.status})
+            return Response(
+                body,
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': location, 'Preference-Applied': 'respond-async'},
+            )
+
+        result = sync_payload(payload['model'], payload['data'], payload.get('conflict_key'), payload['partial'])
+        if result.get('errors'):
+            return Response(ok('Sync partially successful', result))
+        return Response(ok('Sync successful', result))
+
+    def post_stream(self, request):
+        # Options travel in the query string; the body is read line by line and never
+        # parsed into request.data.
+        serializer = SyncStreamSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        lines = iter(request.stream.readline, b'') if request.stream is not None else iter(())
+        result = sync_stream(
+            options['model'],
+            lines,
+            options.get('chunk_size', settings.SYNC_STREAM_CHUNK_SIZE),
+            options.get('conflict_key'),
+        )
         return Response(ok('Sync successful', result))
 
 
 class SyncStatsView(APIView):
     @monitored('sync.stats')
     def get(self, request):
-        rows = SyncHistory.objects.values('status').annotate(count=Count('id'))
+        serializer = SyncStatsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        # Counters are maintained on every status change, so this reads one row per
+        # (model, status) instead of scanning the history table.
+        counts = SyncStatusCount.objects.filter(total__gt=0)
+        if params.get('model'):
+            counts = counts.filter(model=params['model'])
         summary = {}
         total = 0
-        for row in rows:
+        for row in counts.values('status').annotate(count=Sum('total')):
             summary[row['status']] = row['count']
             total += row['count']
         summary['total'] = total
+
+        if params.get('since'):
+            summary['granularity'] = params['granularity']
+            summary['series'] = self.series(params)
         return Response(ok('Sync stats retrieved successfully', summary))
+
+    def series(self, params: dict) -> list[dict]:
+        buckets = SyncStatsBucket.objects.filter(granularity=params['granularity'], bucket_start__gte=params['since'])
+        if params.get('until'):
+            buckets = buckets.filter(bucket_start__lt=params['until'])
+        if params.get('model'):
+            buckets = buckets.filter(model=params['model'])
+
+        rows = (
+            buckets.values('bucket_start', 'status')
+            .annotate(count=Sum('total'), items=Sum('items'), duration_ms=Sum('duration_ms'))
+            .order_by('bucket_start')
+        )
+        series: dict = {}
+        for row in rows:
+            point = series.setdefault(row['bucket_start'], {
+                'bucket_start': row['bucket_start'].isoformat(),
+                'items': 0,
+                'duration_ms': 0,
+            })
+            point[row['status']] = row['count']
+            point['items'] += row['items']
+            point['duration_ms'] += row['duration_ms']
+        return list(series.values())
+
+
+class SyncWatermarksView(APIView):
+    @monitored('sync.watermarks')
+    def get(self, request):
+        serializer = SyncWatermarksQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        model = serializer.validated_data.get('model')
+
+        names = [model] if model else list(MODEL_SERIALIZERS)
+        watermarks = {name: high_water_marks(MODEL_SERIALIZERS[name].Meta.model) for name in names}
+        return Response(ok('Sync watermarks retrieved successfully', watermarks))
+
+
+class ChangesView(APIView):
+    @monitored('sync.changes')
+    def get(self, request):
+        serializer = ChangesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        changes = read_changes(params.get('since'), params['limit'], params.get('model'))
+        return Response(ok('Changes retrieved successfully', changes))
+
+
+class ExportView(APIView):
+    # NDJSON unless the client asks for CSV with ?format=csv or Accept: text/csv
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    content_negotiation_class = ExportContentNegotiation
+
+    @monitored('sync.export')
+    def get(self, request, model):
+        serializer = ExportQuerySerializer(data={**request.query_params.dict(), 'model': model})
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        ModelClass = MODEL_SERIALIZERS[params['model']].Meta.model
+        chunks = export_chunks(ModelClass, params.get('updated_since'), params.get('updated_until'))
+        renderer = request.accepted_renderer
+        if renderer.format == 'csv':
+            body = csv_body(chunks, export_columns(ModelClass))
+        else:
+            body = ndjson_body(chunks)
+        if isinstance(request._request, ASGIRequest):
+            body = async_body(body)
+
+        response = StreamingHttpResponse(body, content_type=renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="{model}.{renderer.format}"'
+        return response
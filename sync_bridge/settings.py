@@ -58,12 +58,38 @@ TEMPLATES = [
 WSGI_APPLICATION = 'sync_bridge.wsgi.application'
 ASGI_APPLICATION = 'sync_bridge.asgi.application'
 
+# Applied to every SQLite connection. WAL lets readers run alongside the single writer.
+# Transactions begin DEFERRED so reads never take the write lock; write paths begin
+# IMMEDIATE themselves (common.db.immediate_atomic).
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-65536')),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '10000')),
+}
+SQLITE_OPTIONS = {
+    'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+    'transaction_mode': os.getenv('SQLITE_TRANSACTION_MODE', 'DEFERRED'),
+}
+
+DB_PATH = Path(os.getenv('DB_PATH', str(BASE_DIR / 'sync-bridge.db')))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.getenv('DB_PATH', str(BASE_DIR / 'sync-bridge.db')),
-    }
+        'NAME': str(DB_PATH),
+        'OPTIONS': SQLITE_OPTIONS,
+    },
+    # Sync history, stats and idempotency keys live in their own file so audit writes
+    # never wait on the business tables' writer lock (see sync_history.routers)
+    'history': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('HISTORY_DB_PATH', str(DB_PATH.with_name(f'{DB_PATH.stem}-history{DB_PATH.suffix}'))),
+        'OPTIONS': SQLITE_OPTIONS,
+    },
 }
+DATABASE_ROUTERS = ['sync_history.routers.SyncHistoryRouter']
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -99,6 +125,35 @@ CHANNEL_LAYERS = {
 
 APP_AUTH_TOKEN = os.getenv('APP_AUTH_TOKEN')
 
+SYNC_BATCH_SIZE = int(os.getenv('SYNC_BATCH_SIZE', '500'))
+SYNC_WRITE_LANE = os.getenv('SYNC_WRITE_LANE', 'true').lower() == 'true'
+SYNC_STREAM_CHUNK_SIZE = int(os.getenv('SYNC_STREAM_CHUNK_SIZE', '1000'))
+SYNC_EXPORT_CHUNK_SIZE = int(os.getenv('SYNC_EXPORT_CHUNK_SIZE', '2000'))
+SYNC_WORKER_CONCURRENCY = int(os.getenv('SYNC_WORKER_CONCURRENCY', '2'))
+SYNC_WORKER_POLL_INTERVAL = float(os.getenv('SYNC_WORKER_POLL_INTERVAL', '1.0'))
+SYNC_JOB_STALE_AFTER = float(os.getenv('SYNC_JOB_STALE_AFTER', '600'))
+SYNC_RETRY_CONCURRENCY = int(os.getenv('SYNC_RETRY_CONCURRENCY', '2'))
+SYNC_RETRY_MAX_ATTEMPTS = int(os.getenv('SYNC_RETRY_MAX_ATTEMPTS', '5'))
+SYNC_RETRY_BACKOFF = float(os.getenv('SYNC_RETRY_BACKOFF', '30'))
+SYNC_RETRY_BACKOFF_MAX = float(os.getenv('SYNC_RETRY_BACKOFF_MAX', '3600'))
+SYNC_HISTORY_COUNT_TTL = int(os.getenv('SYNC_HISTORY_COUNT_TTL', '30'))
+SYNC_IDEMPOTENCY_TTL = int(os.getenv('SYNC_IDEMPOTENCY_TTL', '86400'))
+SYNC_IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('SYNC_IDEMPOTENCY_LOCK_TIMEOUT', '600'))
+SYNC_IDEMPOTENCY_WAIT = float(os.getenv('SYNC_IDEMPOTENCY_WAIT', '10'))
+
+GRAPHQL_DEFAULT_PAGE_SIZE = int(os.getenv('GRAPHQL_DEFAULT_PAGE_SIZE', '10'))
+GRAPHQL_MAX_PAGE_SIZE = int(os.getenv('GRAPHQL_MAX_PAGE_SIZE', '100'))
+GRAPHQL_CACHE_SIZE = int(os.getenv('GRAPHQL_CACHE_SIZE', '512'))
+GRAPHQL_CACHE_TTL = float(os.getenv('GRAPHQL_CACHE_TTL', '60'))
+GRAPHQL_SUBSCRIPTION_QUEUE_SIZE = int(os.getenv('GRAPHQL_SUBSCRIPTION_QUEUE_SIZE', '100'))
+# drop_oldest, coalesce (a full queue folds a new changes batch into the newest queued one) or disconnect
+GRAPHQL_SUBSCRIPTION_OVERFLOW = os.getenv('GRAPHQL_SUBSCRIPTION_OVERFLOW', 'drop_oldest')
+# graphql_api.pubsub.SQLitePubSub reaches subscribers in every worker process
+GRAPHQL_PUBSUB_BACKEND = os.getenv('GRAPHQL_PUBSUB_BACKEND', 'graphql_api.pubsub.InMemoryPubSub')
+GRAPHQL_PUBSUB_POLL_INTERVAL = float(os.getenv('GRAPHQL_PUBSUB_POLL_INTERVAL', '0.25'))
+GRAPHQL_PUBSUB_BATCH_SIZE = int(os.getenv('GRAPHQL_PUBSUB_BATCH_SIZE', '500'))
+GRAPHQL_PUBSUB_RETENTION = int(os.getenv('GRAPHQL_PUBSUB_RETENTION', '300'))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -7,5 +7,6 @@ urlpatterns = [
     path('api/v1/', include('health.urls')),
     path('api/v1/', include('sync.urls')),
     path('api/v1/', include('sync_history.urls')),
+    path('api/v1/', include('graphql_api.urls')),
     path('graphql', graphql_view, name='graphql'),
 ]
@@ -0,0 +1,96 @@
+import importlib
+from datetime import datetime, timezone as dt_timezone
+from types import SimpleNamespace
+from typing import Optional
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from common.db import immediate_atomic
+from sync_history.models import SyncHistory, SyncStatsBucket, SyncStatusCount
+from sync_history.routers import HISTORY_DB
+
+# The router never migrates sync_history on the default database, so a table left there
+# still has the columns of sync_history 0001
+LEGACY_COLUMNS = ('id', 'payload', 'status', 'failure_reason', 'retries', 'created_at', 'updated_at')
+
+# Rebuilds the status counters and time buckets from the history rows
+backfill_stats = importlib.import_module('sync_history.migrations.0007_sync_stats_rollups').backfill_stats
+
+
+def _legacy_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        moment = value
+    else:
+        moment = parse_datetime(value)
+    if moment is not None and settings.USE_TZ and timezone.is_naive(moment):
+        # SQLite stores aware datetimes as naive UTC
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+class Command(BaseCommand):
+    help = 'Copy sync history rows written before the history database split out of the default database.'
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        table = SyncHistory._meta.db_table
+        if table not in source.introspection.table_names():
+            self.stdout.write(f"{table}: no legacy table in the default database")
+            return
+        with source.cursor() as cursor:
+            columns = {column.name for column in source.introspection.get_table_description(cursor, table)}
+        missing = set(LEGACY_COLUMNS) - columns
+        if missing:
+            raise CommandError(f"{table} in the default database lacks {', '.join(sorted(missing))}")
+
+        batch_size = settings.SYNC_BATCH_SIZE
+        target = SyncHistory.objects.using(HISTORY_DB)
+        select = (
+            f"SELECT {', '.join(source.ops.quote_name(column) for column in LEGACY_COLUMNS)} "
+            f"FROM {source.ops.quote_name(table)} WHERE id > %s ORDER BY id LIMIT %s"
+        )
+        processed = copied = 0
+        last_id = 0
+        while True:
+            with source.cursor() as cursor:
+                cursor.execute(select, [last_id, batch_size])
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            processed += len(rows)
+
+            present = set(target.filter(pk__in=[row[0] for row in rows]).values_list('pk', flat=True))
+            histories = []
+            stamps = []
+            for pk, payload, status, failure_reason, retries, created_at, updated_at in rows:
+                if pk in present:
+                    continue
+                # The model of a legacy sync was never recorded; '' keeps it out of retries
+                history = SyncHistory(id=pk, status=status, failure_reason=failure_reason, retries=retries)
+                # Compressed, sized and hashed like any new row
+                history.payload = payload or ''
+                histories.append(history)
+                stamps.append((_legacy_datetime(created_at), _legacy_datetime(updated_at)))
+            if not histories:
+                continue
+            with immediate_atomic(using=HISTORY_DB):
+                target.bulk_create(histories)
+                # bulk_create stamps the auto_now columns; put the original times back
+                for history, (created_at, updated_at) in zip(histories, stamps):
+                    history.created_at, history.updated_at = created_at, updated_at
+                target.bulk_update(histories, ['created_at', 'updated_at'])
+            copied += len(histories)
+
+        with immediate_atomic(using=HISTORY_DB):
+            SyncStatusCount.objects.using(HISTORY_DB).all().delete()
+            SyncStatsBucket.objects.using(HISTORY_DB).all().delete()
+            backfill_stats(apps, SimpleNamespace(connection=connections[HISTORY_DB]))
+        self.stdout.write(
+            f"{table}: {processed} rows processed, {copied} copied, {processed - copied} already present; "
+            "stats rebuilt"
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync_history', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synchistory',
+            name='committed_chunks',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='synchistory',
+            name='processed_items',
+            field=models.IntegerField(default=0),
+        ),
+    ]
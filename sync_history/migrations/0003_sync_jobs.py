@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync_history', '0002_sync_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synchistory',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='synchistory',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='synchistory',
+            name='model',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='synchistory',
+            name='options',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='synchistory',
+            name='status',
+            field=models.CharField(choices=[('successful', 'Successful'), ('failed', 'Failed'), ('invalid', 'Invalid'), ('pending_retry', 'Pending Retry'), ('queued', 'Queued'), ('processing', 'Processing')], default='pending_retry', max_length=32),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync_history', '0003_sync_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synchistory',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,74 @@
+import hashlib
+import zlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def compress_payloads(apps, schema_editor):
+    SyncHistory = apps.get_model('sync_history', 'SyncHistory')
+    db_alias = schema_editor.connection.alias
+    batch = []
+    for history in SyncHistory.objects.using(db_alias).only('id', 'payload').iterator(chunk_size=BATCH_SIZE):
+        raw = (history.payload or '').encode('utf-8')
+        history.payload_data = zlib.compress(raw) if raw else b''
+        history.payload_size = len(raw)
+        history.payload_hash = hashlib.sha256(raw).hexdigest() if raw else ''
+        batch.append(history)
+        if len(batch) >= BATCH_SIZE:
+            SyncHistory.objects.using(db_alias).bulk_update(batch, ['payload_data', 'payload_size', 'payload_hash'])
+            batch = []
+    if batch:
+        SyncHistory.objects.using(db_alias).bulk_update(batch, ['payload_data', 'payload_size', 'payload_hash'])
+
+
+def decompress_payloads(apps, schema_editor):
+    SyncHistory = apps.get_model('sync_history', 'SyncHistory')
+    db_alias = schema_editor.connection.alias
+    batch = []
+    for history in SyncHistory.objects.using(db_alias).only('id', 'payload_data').iterator(chunk_size=BATCH_SIZE):
+        data = bytes(history.payload_data or b'')
+        history.payload = zlib.decompress(data).decode('utf-8') if data else ''
+        batch.append(history)
+        if len(batch) >= BATCH_SIZE:
+            SyncHistory.objects.using(db_alias).bulk_update(batch, ['payload'])
+            batch = []
+    if batch:
+        SyncHistory.objects.using(db_alias).bulk_update(batch, ['payload'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync_history', '0004_sync_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synchistory',
+            name='payload_data',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='synchistory',
+            name='payload_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='synchistory',
+            name='payload_size',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(compress_payloads, decompress_payloads),
+        # A default lets the column be re-created on a populated table when migrating back
+        migrations.AlterField(
+            model_name='synchistory',
+            name='payload',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='synchistory',
+            name='payload',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync_history', '0005_compressed_payload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='synchistory',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='synchistory_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synchistory',
+            index=models.Index(fields=['created_at', 'id'], name='synchistory_created_idx'),
+        ),
+    ]
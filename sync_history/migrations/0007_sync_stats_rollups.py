@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+
+TERMINAL_STATUSES = ('successful', 'failed', 'invalid')
+
+
+def backfill_stats(apps, schema_editor):
+    SyncHistory = apps.get_model('sync_history', 'SyncHistory')
+    SyncStatusCount = apps.get_model('sync_history', 'SyncStatusCount')
+    SyncStatsBucket = apps.get_model('sync_history', 'SyncStatsBucket')
+    db_alias = schema_editor.connection.alias
+
+    counts = Counter()
+    buckets = defaultdict(lambda: [0, 0])
+    rows = SyncHistory.objects.using(db_alias).values_list('model', 'status', 'created_at', 'updated_at')
+    for model, status, created_at, updated_at in rows.iterator(chunk_size=2000):
+        counts[(model, status)] += 1
+        if status not in TERMINAL_STATUSES:
+            continue
+        duration_ms = int((updated_at - created_at).total_seconds() * 1000)
+        for granularity, start in (
+            ('minute', updated_at.replace(second=0, microsecond=0)),
+            ('hour', updated_at.replace(minute=0, second=0, microsecond=0)),
+        ):
+            bucket = buckets[(granularity, start, model, status)]
+            bucket[0] += 1
+            bucket[1] += duration_ms
+
+    SyncStatusCount.objects.using(db_alias).bulk_create(
+        [SyncStatusCount(model=model, status=status, total=total) for (model, status), total in counts.items()],
+        batch_size=500,
+    )
+    SyncStatsBucket.objects.using(db_alias).bulk_create(
+        [
+            SyncStatsBucket(
+                granularity=granularity,
+                bucket_start=start,
+                model=model,
+                status=status,
+                total=total,
+                duration_ms=duration_ms,
+            )
+            for (granularity, start, model, status), (total, duration_ms) in buckets.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync_history', '0006_history_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncStatsBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('model', models.CharField(max_length=32)),
+                ('status', models.CharField(choices=[('successful', 'Successful'), ('failed', 'Failed'), ('invalid', 'Invalid'), ('pending_retry', 'Pending Retry'), ('queued', 'Queued'), ('processing', 'Processing')], max_length=32)),
+                ('total', models.BigIntegerField(default=0)),
+                ('items', models.BigIntegerField(default=0)),
+                ('duration_ms', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket_start', 'model', 'status'), name='syncstatsbucket_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32)),
+                ('status', models.CharField(choices=[('successful', 'Successful'), ('failed', 'Failed'), ('invalid', 'Invalid'), ('pending_retry', 'Pending Retry'), ('queued', 'Queued'), ('processing', 'Processing')], max_length=32)),
+                ('total', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model', 'status'), name='syncstatuscount_model_status_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync_history', '0007_sync_stats_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synchistory',
+            name='failed_items',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='synchistory',
+            name='status',
+            field=models.CharField(choices=[('successful', 'Successful'), ('failed', 'Failed'), ('invalid', 'Invalid'), ('pending_retry', 'Pending Retry'), ('queued', 'Queued'), ('processing', 'Processing'), ('partial', 'Partial')], default='pending_retry', max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='syncstatsbucket',
+            name='status',
+            field=models.CharField(choices=[('successful', 'Successful'), ('failed', 'Failed'), ('invalid', 'Invalid'), ('pending_retry', 'Pending Retry'), ('queued', 'Queued'), ('processing', 'Processing'), ('partial', 'Partial')], max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='syncstatuscount',
+            name='status',
+            field=models.CharField(choices=[('successful', 'Successful'), ('failed', 'Failed'), ('invalid', 'Invalid'), ('pending_retry', 'Pending Retry'), ('queued', 'Queued'), ('processing', 'Processing'), ('partial', 'Partial')], max_length=32),
+        ),
+    ]
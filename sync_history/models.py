@@ -1,17 +1,103 @@
+import hashlib
+import zlib
 from django.db import models
 
+# Columns written together whenever the payload changes
+PAYLOAD_FIELDS = ['payload_data', 'payload_size', 'payload_hash']
+
 
 class SyncStatus(models.TextChoices):
     SUCCESSFUL = 'successful'
     FAILED = 'failed'
     INVALID = 'invalid'
     PENDING_RETRY = 'pending_retry'
+    QUEUED = 'queued'
+    PROCESSING = 'processing'
+    PARTIAL = 'partial'
 
 
 class SyncHistory(models.Model):
-    payload = models.TextField()
+    model = models.CharField(max_length=32, blank=True, default='')
+    options = models.JSONField(default=dict, blank=True)
+    payload_data = models.BinaryField(default=b'')
+    payload_size = models.IntegerField(default=0)
+    payload_hash = models.CharField(max_length=64, blank=True, default='')
     status = models.CharField(max_length=32, choices=SyncStatus.choices, default=SyncStatus.PENDING_RETRY)
     failure_reason = models.TextField(blank=True, null=True)
+    # Payload indexes still to be retried after a partial sync; empty means the whole payload
+    failed_items = models.JSONField(default=list, blank=True)
     retries = models.IntegerField(default=0)
+    next_retry_at = models.DateTimeField(blank=True, null=True)
+    processed_items = models.IntegerField(default=0)
+    committed_chunks = models.IntegerField(default=0)
+    claimed_by = models.CharField(max_length=128, blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset listing walks (created_at, id), optionally within one status
+            models.Index(fields=['status', 'created_at', 'id'], name='synchistory_status_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='synchistory_created_idx'),
+        ]
+
+    @property
+    def payload(self) -> str:
+        # Decompressed on access only; list queries defer payload_data entirely
+        data = bytes(self.payload_data or b'')
+        return zlib.decompress(data).decode('utf-8') if data else ''
+
+    @payload.setter
+    def payload(self, value: str) -> None:
+        raw = value.encode('utf-8')
+        self.payload_data = zlib.compress(raw) if raw else b''
+        self.payload_size = len(raw)
+        self.payload_hash = hashlib.sha256(raw).hexdigest() if raw else ''
+
+
+class SyncStatusCount(models.Model):
+    # Current number of history rows per (model, status), kept in step with every transition
+    model = models.CharField(max_length=32)
+    status = models.CharField(max_length=32, choices=SyncStatus.choices)
+    total = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'status'], name='syncstatuscount_model_status_uniq'),
+        ]
+
+
+class StatsGranularity(models.TextChoices):
+    MINUTE = 'minute'
+    HOUR = 'hour'
+
+
+class SyncStatsBucket(models.Model):
+    # Syncs that reached a terminal status within one minute or hour, for throughput graphs
+    granularity = models.CharField(max_length=8, choices=StatsGranularity.choices)
+    bucket_start = models.DateTimeField()
+    model = models.CharField(max_length=32)
+    status = models.CharField(max_length=32, choices=SyncStatus.choices)
+    total = models.BigIntegerField(default=0)
+    items = models.BigIntegerField(default=0)
+    duration_ms = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'model', 'status'], name='syncstatsbucket_bucket_uniq'
+            ),
+        ]
+
+
+class SyncIdempotencyKey(models.Model):
+    # Outcome of a POST /sync sent with an Idempotency-Key header. While response_status
+    # is null the original request is still running.
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.IntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True)
+    response_headers = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
@@ -0,0 +1,24 @@
+HISTORY_APP = 'sync_history'
+HISTORY_DB = 'history'
+
+
+class SyncHistoryRouter:
+    # Routes every sync_history model to the history database and keeps all other apps off it
+    def db_for_read(self, model, **hints):
+        return HISTORY_DB if model._meta.app_label == HISTORY_APP else None
+
+    def db_for_write(self, model, **hints):
+        return HISTORY_DB if model._meta.app_label == HISTORY_APP else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Foreign keys cannot cross SQLite files
+        if HISTORY_APP in (obj1._meta.app_label, obj2._meta.app_label):
+            return obj1._meta.app_label == obj2._meta.app_label
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == HISTORY_APP:
+            return db == HISTORY_DB
+        if db == HISTORY_DB:
+            return False
+        return None
@@ -1,9 +1,27 @@
 from rest_framework import serializers
+
+from sync.serializers import SYNC_MODELS
 from .models import SyncHistory
 
 
-class SyncHistorySerializer(serializers.ModelSerializer):
+class SyncHistoryListSerializer(serializers.ModelSerializer):
     class Meta:
         model = SyncHistory
-        fields = ['id', 'payload', 'status', 'failure_reason', 'retries', 'created_at', 'updated_at']
+        fields = [
+            'id', 'model', 'options', 'payload_size', 'payload_hash', 'status', 'failure_reason', 'failed_items',
+            'retries', 'next_retry_at', 'processed_items', 'committed_chunks', 'created_at', 'updated_at',
+        ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class SyncHistorySerializer(SyncHistoryListSerializer):
+    payload = serializers.CharField(read_only=True)
+
+    class Meta(SyncHistoryListSerializer.Meta):
+        fields = SyncHistoryListSerializer.Meta.fields + ['payload']
+
+
+class SyncHistoryBulkRetrySerializer(serializers.Serializer):
+    since = serializers.DateTimeField()
+    until = serializers.DateTimeField(required=False)
+    model = serializers.ChoiceField(choices=SYNC_MODELS, required=False)
@@ -0,0 +1,117 @@
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from django.db import connections, router, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from common.db import immediate_atomic
+from .models import (
+    PAYLOAD_FIELDS,
+    StatsGranularity,
+    SyncHistory,
+    SyncStatsBucket,
+    SyncStatus,
+    SyncStatusCount,
+)
+
+# Statuses that end an attempt; reaching one adds an event to the time buckets
+TERMINAL_STATUSES = (SyncStatus.SUCCESSFUL, SyncStatus.FAILED, SyncStatus.INVALID, SyncStatus.PARTIAL)
+
+
+def history_db() -> str:
+    return router.db_for_write(SyncHistory)
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == StatsGranularity.MINUTE:
+        return moment.replace(second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_status_change(
+    model: str,
+    previous: Optional[str],
+    status: Optional[str],
+    count: int = 1,
+    items: int = 0,
+    duration_ms: int = 0,
+) -> None:
+    # Counters are incremented in place with INSERT ... ON CONFLICT DO UPDATE so that
+    # concurrent writers never lose an update.
+    connection = connections[history_db()]
+    counts_table = connection.ops.quote_name(SyncStatusCount._meta.db_table)
+    buckets_table = connection.ops.quote_name(SyncStatsBucket._meta.db_table)
+
+    deltas = []
+    if previous:
+        deltas.append((model, previous, -count))
+    if status:
+        deltas.append((model, status, count))
+
+    with connection.cursor() as cursor:
+        if deltas:
+            cursor.executemany(
+                f"INSERT INTO {counts_table} (model, status, total) VALUES (%s, %s, %s) "
+                "ON CONFLICT (model, status) DO UPDATE SET total = total + excluded.total",
+                deltas,
+            )
+        if status in TERMINAL_STATUSES:
+            now = timezone.now()
+            rows = [
+                (
+                    granularity,
+                    connection.ops.adapt_datetimefield_value(bucket_start(now, granularity)),
+                    model,
+                    status,
+                    count,
+                    items,
+                    duration_ms,
+                )
+                for granularity in StatsGranularity.values
+            ]
+            cursor.executemany(
+                f"INSERT INTO {buckets_table} (granularity, bucket_start, model, status, total, items, duration_ms) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s) "
+                "ON CONFLICT (granularity, bucket_start, model, status) DO UPDATE SET "
+                "total = total + excluded.total, items = items + excluded.items, "
+                "duration_ms = duration_ms + excluded.duration_ms",
+                rows,
+            )
+
+
+def create_history(**fields) -> SyncHistory:
+    with transaction.atomic(using=history_db()):
+        history = SyncHistory.objects.create(**fields)
+        record_status_change(history.model, None, history.status)
+    return history
+
+
+def change_status(history: SyncHistory, status: str, items: int = 0, duration_ms: int = 0, **fields) -> None:
+    previous = history.status
+    history.status = status
+    update_fields = ['status', 'updated_at']
+    for name, value in fields.items():
+        setattr(history, name, value)
+        update_fields.extend(PAYLOAD_FIELDS if name == 'payload' else [name])
+
+    with transaction.atomic(using=history_db()):
+        history.save(update_fields=update_fields)
+        record_status_change(history.model, previous, status, items=items, duration_ms=duration_ms)
+
+
+def change_status_bulk(queryset: QuerySet, status: str, **fields) -> int:
+    # Per-(model, status) tallies are taken inside the same transaction as the UPDATE,
+    # which holds the write lock from the start
+    with immediate_atomic(using=history_db()):
+        tallies = Counter(queryset.values_list('model', 'status'))
+        updated = queryset.update(status=status, updated_at=timezone.now(), **fields)
+        for (model, previous), count in tallies.items():
+            record_status_change(model, previous, status, count=count)
+    return updated
+
+
+def delete_history(history: SyncHistory) -> None:
+    with transaction.atomic(using=history_db()):
+        history.delete()
+        record_status_change(history.model, history.status, None)
@@ -1,14 +1,59 @@
+import base64
+import hashlib
+from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
+from django.utils import timezone
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
 
 from common.responses import ok, response_with_status
 from common.monitoring import monitored
 from .models import SyncHistory, SyncStatus
-from .serializers import SyncHistorySerializer
+from .stats import change_status_bulk, delete_history
+from .serializers import SyncHistorySerializer, SyncHistoryListSerializer, SyncHistoryBulkRetrySerializer
+
+# A partial sync's retry replays only the items listed in failed_items
+RETRYABLE_STATUSES = (SyncStatus.FAILED, SyncStatus.PARTIAL)
+
+
+def _replayable():
+    # Rows recorded without a model, and streams, which only kept their failing chunk,
+    # cannot be replayed
+    return SyncHistory.objects.filter(status__in=RETRYABLE_STATUSES).exclude(model='').exclude(
+        options__has_key='stream'
+    )
+
+
+def _wants_exact_count(request) -> bool:
+    return request.query_params.get('count') == 'exact'
+
+
+class CachedCountPaginator(Paginator):
+    # COUNT(*) over the history table is cached per query for SYNC_HISTORY_COUNT_TTL
+    # seconds; ?count=exact recomputes it and refreshes the cache.
+    def __init__(self, *args, exact: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact = exact
+
+    @cached_property
+    def count(self) -> int:
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'sync_history:count:' + hashlib.sha1(f'{sql}{params}'.encode('utf-8')).hexdigest()
+        if not self.exact:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        count = self.object_list.count()
+        cache.set(key, count, settings.SYNC_HISTORY_COUNT_TTL)
+        return count
 
 
 class CustomPagination(PageNumberPagination):
@@ -16,6 +61,13 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'size'
     max_page_size = 100
 
+    def paginate_queryset(self, queryset, request, view=None):
+        self.exact_count = _wants_exact_count(request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, queryset, page_size):
+        return CachedCountPaginator(queryset, page_size, exact=self.exact_count)
+
     def get_paginated_response(self, data):
         return Response(ok('Sync histories retrieved successfully', {
             'data': data,
@@ -25,16 +77,72 @@ class CustomPagination(PageNumberPagination):
         }))
 
 
+class KeysetPagination(BasePagination):
+    # Seeks on (created_at, id) instead of OFFSET, so deep pages cost the same as the first.
+    # The total is only computed when asked for with ?count=exact.
+    page_size = 15
+    page_size_query_param = 'size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.size = self.get_page_size(request)
+        self.total = queryset.count() if _wants_exact_count(request) else None
+
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        rows = list(queryset[:self.size + 1])
+        has_next = len(rows) > self.size
+        rows = rows[:self.size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if has_next else None
+        return rows
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, history: SyncHistory) -> str:
+        raw = f'{history.created_at.isoformat()}|{history.id}'
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor: str) -> tuple[datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            created_at, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, UnicodeError) as exc:
+            raise ValidationError({'cursor': 'Invalid cursor.'}) from exc
+
+    def get_paginated_response(self, data):
+        payload = {'data': data, 'size': self.size, 'next_cursor': self.next_cursor}
+        if self.total is not None:
+            payload['total'] = self.total
+        return Response(ok('Sync histories retrieved successfully', payload))
+
+
 class SyncHistoryListView(generics.ListAPIView):
-    serializer_class = SyncHistorySerializer
+    serializer_class = SyncHistoryListSerializer
     pagination_class = CustomPagination
 
+    @property
+    def paginator(self):
+        # Passing ?cursor (empty for the first page) switches to keyset pagination
+        if not hasattr(self, '_paginator'):
+            self._paginator = KeysetPagination() if 'cursor' in self.request.query_params else self.pagination_class()
+        return self._paginator
+
     @monitored('sync_history.list', tags=['status'])
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        queryset = SyncHistory.objects.all().order_by('-created_at')
+        queryset = SyncHistory.objects.defer('payload_data').order_by('-created_at', '-id')
         status_filter = self.request.query_params.get('status')
 
         if status_filter:
@@ -62,15 +170,41 @@ class SyncHistoryDetailView(generics.RetrieveDestroyAPIView):
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def perform_destroy(self, instance):
+        delete_history(instance)
+
 
 class SyncHistoryRetryView(APIView):
     @monitored('sync_history.retry', tags=['id'])
     def post(self, request, history_id: int):
+        # The checks are part of the update, so concurrent retries schedule the entry once
+        scheduled = change_status_bulk(
+            _replayable().filter(pk=history_id), SyncStatus.PENDING_RETRY, next_retry_at=timezone.now()
+        )
         history = get_object_or_404(SyncHistory, id=history_id)
 
-        if history.status != SyncStatus.FAILED:
-            raise ValidationError({'status': 'Only failed syncs can be retried.'})
+        if not scheduled:
+            if history.status not in RETRYABLE_STATUSES:
+                raise ValidationError({'status': 'Only failed or partial syncs can be retried.'})
+            if history.options.get('stream'):
+                raise ValidationError({'options': 'A streamed sync only kept its failing chunk and cannot be replayed.'})
+            raise ValidationError({'model': 'This sync was recorded without a model and cannot be replayed.'})
 
-        history.status = SyncStatus.PENDING_RETRY
-        history.save(update_fields=['status', 'updated_at'])
         return Response(ok('Sync history will be retried', SyncHistorySerializer(history).data))
+
+
+class SyncHistoryBulkRetryView(APIView):
+    @monitored('sync_history.retry_bulk', tags=['model'])
+    def post(self, request):
+        serializer = SyncHistoryBulkRetrySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        queryset = _replayable().filter(created_at__gte=params['since'])
+        if params.get('until'):
+            queryset = queryset.filter(created_at__lt=params['until'])
+        if params.get('model'):
+            queryset = queryset.filter(model=params['model'])
+
+        count = change_status_bulk(queryset, SyncStatus.PENDING_RETRY, next_retry_at=timezone.now())
+        return Response(ok('Sync histories will be retried', {'count': count}))